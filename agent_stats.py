@@ -0,0 +1,191 @@
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Equipo Horatio: agentes con correo del dominio
+HORATIO_DOMAIN = "@hirehoratio.co"
+TEAM_GROUP = "Horatio Team"
+CLOSED_STATUSES = ['approved', 'rejected']
+# Bigotes del boxplot: hasta 1.5 veces el rango intercuartil, como el boxplot de Vega-Lite
+WHISKER_IQR = 1.5
+# Ancho (días) de las barras del histograma de antigüedad de casos abiertos
+AGING_BIN_DAYS = 10
+OLDEST_OPEN_CASES = 10
+
+# Ciclo de vida de cada caso (una fila por caso), escrito por el refresh junto a las tablas normalizadas
+LIFECYCLE_FILE = "Cases_lifecycle.parquet"
+LIFECYCLE_COLUMNS = ['case_id', 'assignee_name', 'in_team', 'cases_status', 'created_at', 'last_activity_cases',
+                     'closed', 'resolution_days']
+
+
+def case_lifecycle(cases):
+    """One row per case: assignee, team flag, status, created / last activity, closed flag and resolution days.
+
+    ``cases`` is the prepared cases table. Days open depend on the day the page is viewed, so
+    they are derived from created_at when the stats are computed.
+    """
+    closed = cases['cases_status'].isin(CLOSED_STATUSES).to_numpy()
+    return pd.DataFrame({
+        'case_id': cases['case_id'].to_numpy(),
+        'assignee_name': cases['assignee_name'].to_numpy(),
+        'in_team': cases['assignee_email'].str.endswith(HORATIO_DOMAIN, na=False).to_numpy(),
+        'cases_status': cases['cases_status'].to_numpy(),
+        'created_at': cases['created_at'].to_numpy(),
+        'last_activity_cases': cases['last_activity_cases'].to_numpy(),
+        'closed': closed,
+        'resolution_days': (cases['last_activity_cases'] - cases['created_at']).dt.days.where(closed).to_numpy(),
+    })
+
+
+def update_lifecycle(cases, previous=None, changed=None):
+    """The lifecycle table of ``cases``, recomputing only the ``changed`` case IDs when ``previous`` is given.
+
+    Rows of cases that are no longer in ``cases`` are dropped.
+    """
+    if previous is None or changed is None:
+        return case_lifecycle(cases)
+    changed = pd.Index(pd.unique(np.asarray(changed, dtype=object)))
+    kept = previous[previous['case_id'].isin(cases['case_id']) & ~previous['case_id'].isin(changed)]
+    fresh = case_lifecycle(cases[cases['case_id'].isin(changed)])
+    return pd.concat([kept, fresh], ignore_index=True)
+
+
+def write_lifecycle(cases, path=LIFECYCLE_FILE, previous_path=None, changed=None):
+    """Write the lifecycle table; with ``previous_path`` and ``changed``, update the previous version's table."""
+    previous = read_lifecycle(previous_path) if previous_path and changed is not None else None
+    lifecycle = update_lifecycle(cases, previous, changed)
+    table = pa.Table.from_pandas(lifecycle.astype({'assignee_name': 'category', 'cases_status': 'category'}),
+                                 preserve_index=False)
+    pq.write_table(table, path + ".tmp", compression="zstd")
+    os.replace(path + ".tmp", path)
+    return len(lifecycle)
+
+
+def read_lifecycle(path=LIFECYCLE_FILE):
+    """Read the lifecycle table, or None when it is missing."""
+    if not path or not os.path.exists(path):
+        return None
+    return pd.read_parquet(path, engine="pyarrow", memory_map=True)
+
+
+def stack_groups(frame):
+    """Stack the rows once under their agent and once more under the Horatio team if they belong to it.
+
+    A single groupby over the stacked frame then yields every agent's metrics and the team's.
+    """
+    by_agent = frame.assign(scope='agent', group=frame['assignee_name'].astype(object))
+    by_team = frame[frame['in_team'].to_numpy()].assign(scope='team', group=TEAM_GROUP)
+    return pd.concat([by_agent, by_team], ignore_index=True)
+
+
+def approval_rate(approved, rejected):
+    decided = approved + rejected
+    return (approved / decided.where(decided > 0)).round(4)
+
+
+def box_stats(frame, keys, column):
+    """Boxplot of ``column`` per group: quartiles, whiskers and the outliers counted per distinct value.
+
+    Whiskers reach the furthest values within WHISKER_IQR interquartile ranges of the box; the
+    values beyond are outliers. The result does not grow with the number of rows.
+    """
+    values = frame.dropna(subset=[column])
+    # Sin valores, unstack no deja columnas: se fijan las de los cuartiles para devolver un box vacío
+    box = values.groupby(keys)[column].quantile([0.25, 0.5, 0.75]).unstack().reindex(columns=[0.25, 0.5, 0.75])
+    box.columns = ['q1', 'median', 'q3']
+    fences = values[keys + [column]].join(box[['q1', 'q3']], on=keys)
+    spread = WHISKER_IQR * (fences['q3'] - fences['q1'])
+    inside = fences[column].between(fences['q1'] - spread, fences['q3'] + spread)
+    box = box.join(fences[inside].groupby(keys)[column].agg(lower='min', upper='max'))
+    outliers = fences[~inside].groupby(keys + [column]).size().rename('cases').reset_index(column)
+    return box, outliers
+
+
+def compute_agent_stats(df, lifecycle, checks, today):
+    """Compute the Advanced Stats metrics for every agent and for the Horatio team at once.
+
+    Case metrics, resolution times and aging come from the lifecycle table (one row per case),
+    check trends from the checks table; every series is grouped by the case's created_at month.
+    Every result is indexed by (scope, group), where scope is 'agent' or 'team', so picking an
+    agent is a lookup.
+    """
+    status = lifecycle['cases_status']
+    base = pd.DataFrame({
+        'case_id': lifecycle['case_id'],
+        'assignee_name': lifecycle['assignee_name'],
+        'in_team': lifecycle['in_team'],
+        'created_at': lifecycle['created_at'],
+        'Month': lifecycle['created_at'].dt.to_period('M').astype(str),
+        'approved': status == 'approved',
+        'rejected': status == 'rejected',
+        'open': status == 'open',
+        'closed': lifecycle['closed'],
+        'resolution_time': lifecycle['resolution_days'],
+        'days_open': (today - lifecycle['created_at']).dt.days.where(status == 'open'),
+    })
+    stacked = stack_groups(base)
+    keys = ['scope', 'group']
+
+    summary = stacked.groupby(keys, sort=False).agg(
+        total_cases=('case_id', 'size'),
+        approved_cases=('approved', 'sum'),
+        rejected_cases=('rejected', 'sum'),
+        open_cases=('open', 'sum'),
+    )
+    summary['approval_rate'] = approval_rate(summary['approved_cases'], summary['rejected_cases'])
+
+    case_trend = stacked.groupby(keys + ['Month']).agg(
+        approved_cases=('approved', 'sum'), total_cases=('case_id', 'size'))
+    case_trend['approved_rate'] = case_trend['approved_cases'] / case_trend['total_cases']
+
+    closed_cases = stacked[stacked['closed']]
+    resolution_trend = closed_cases.groupby(keys + ['Month']).agg(avg_resolution=('resolution_time', 'mean'))
+    resolution_box, resolution_outliers = box_stats(closed_cases, keys, 'resolution_time')
+
+    check_base = checks[['check_id', 'case_id', 'check_status']].merge(
+        base[['case_id', 'assignee_name', 'in_team', 'Month']], on='case_id')
+    check_stacked = stack_groups(check_base.assign(approved=check_base['check_status'] == 'approved'))
+    check_trend = check_stacked.groupby(keys + ['Month']).agg(
+        approved_checks=('approved', 'sum'), total_checks=('check_id', 'size'))
+    check_trend['approved_rate'] = check_trend['approved_checks'] / check_trend['total_checks']
+
+    open_cases = stacked[stacked['open']].astype({'days_open': 'Int64'})
+    aging = open_cases.groupby(keys)['days_open'].describe()
+    # Histograma ya agrupado en barras de AGING_BIN_DAYS días y los casos más antiguos de cada grupo
+    aged = open_cases.dropna(subset=['days_open'])
+    bin_start = aged['days_open'] // AGING_BIN_DAYS * AGING_BIN_DAYS
+    aging_bins = aged.assign(bin_start=bin_start).groupby(keys + ['bin_start']).size().rename('cases').reset_index('bin_start')
+    aging_bins['bin_end'] = aging_bins['bin_start'] + AGING_BIN_DAYS
+    oldest_open = (aged.sort_values('days_open', ascending=False, kind='stable').groupby(keys).head(OLDEST_OPEN_CASES)
+                   .set_index(keys)[['case_id', 'created_at', 'days_open']])
+
+    return {
+        'summary': summary.sort_index(),
+        'case_trend': case_trend.sort_index(),
+        'check_trend': check_trend.sort_index(),
+        'resolution_trend': resolution_trend.sort_index(),
+        'resolution_box': resolution_box.sort_index(),
+        'resolution_outliers': resolution_outliers.sort_index(kind='stable'),
+        'aging': aging.sort_index(),
+        'aging_bins': aging_bins.sort_index(kind='stable'),
+        'oldest_open': oldest_open.sort_index(kind='stable'),
+        # Posiciones de las filas de cada agente en el dataset unido, para la tabla de detalle
+        'agent_rows': df.groupby('assignee_name', observed=True, sort=False).indices,
+    }
+
+
+def lookup(frame, scope, group):
+    """Rows of one agent (or the team) from a (scope, group)-indexed result; empty when absent."""
+    try:
+        rows = frame.loc[(scope, group)]
+    except KeyError:
+        return frame.iloc[0:0].reset_index(drop=True)
+    if isinstance(rows, pd.Series):
+        return rows.to_frame().T.reset_index(drop=True)
+    return rows.reset_index().drop(columns=['scope', 'group'], errors='ignore')
+
+
+def agent_rows(stats, agent):
+    return stats['agent_rows'].get(agent, np.array([], dtype=np.int64))
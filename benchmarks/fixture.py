@@ -0,0 +1,38 @@
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.pool import NullPool
+from benchmarks.synthetic import source_blocks
+
+SOURCE_SCHEMA = "auth"
+
+
+def sqlite_engine(path):
+    """Engine whose schema ``auth`` is the SQLite file at ``path``, so BASE_QUERY runs unchanged.
+
+    Every connection is opened in the thread that uses it and attaches the file, which lets the
+    parallel extraction run too (month partitions only: hash partitions need PostgreSQL's hashtext).
+    """
+    engine = create_engine("sqlite://", poolclass=NullPool)
+
+    @event.listens_for(engine, "connect")
+    def attach(connection, _):
+        connection.execute(f"ATTACH DATABASE '{path}' AS {SOURCE_SCHEMA}")
+
+    return engine
+
+
+def load_fixture(engine, n_cases, seed=0):
+    """Write synthetic dotfile_cases / _individuals / _checks / _addresses tables into schema ``auth``.
+
+    Works on the SQLite engine above or on a PostgreSQL URL (a local test database).
+    Returns the row count of every table.
+    """
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {SOURCE_SCHEMA}"))
+    counts = {}
+    for block, tables in enumerate(source_blocks(n_cases, seed)):
+        for name, frame in tables.items():
+            frame.to_sql(name, engine, schema=SOURCE_SCHEMA, index=False, chunksize=10000,
+                         if_exists="replace" if block == 0 else "append")
+            counts[name] = counts.get(name, 0) + len(frame)
+    return counts
@@ -0,0 +1,316 @@
+import os
+import gc
+import sys
+import json
+import time
+import shutil
+import socket
+import argparse
+import platform
+import tempfile
+import resource
+import subprocess
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from data_store import (SNAPSHOT_FILE, CSV_FILE, PARTITION_DIR, write_snapshot, read_snapshot, prepare_dataset, read_tables,
+                        prepare_tables)
+from dashboard_kpis import ROLLUP_FILE, tables_answer, read_rollup, rollup_answer
+from filter_index import build_filter_index, row_positions, filter_masks, rows_mask, distinct_values, date_bounds
+from agent_stats import TEAM_GROUP, LIFECYCLE_FILE, compute_agent_stats, lookup, agent_rows, read_lifecycle
+from kyc_metrics import DATE_WINDOWS, build_kyc_index, window_positions, filter_options, apply_filters, kyc_kpis
+from data_grid import frame_source
+from exports import iter_chunks, write_export
+import update_data
+from snapshots import current_version, version_path, read_version_manifest
+from benchmarks.synthetic import generate_rows
+from benchmarks.fixture import sqlite_engine, load_fixture
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+DEFAULT_SIZES = "10k,100k,1M"
+# Filas de la página visible de las tablas (el tamaño por defecto de paginated_table)
+PAGE_ROWS = 50
+KYC_SELECT_COLUMNS = ['cases_status', 'check_type', 'risk_level', 'country']
+PAGES = ["Dashboard", "KYC Process Dashboard", "Advanced Stats"]
+
+
+def parse_size(text):
+    """Row counts like 10000, 10k, 1.5M or 20M."""
+    text = text.strip().lower()
+    scale = {'k': 1_000, 'm': 1_000_000}.get(text[-1:], 1)
+    return int(float(text[:-1] if scale > 1 else text) * scale)
+
+
+def reset_peak_rss():
+    """Reset the kernel's peak RSS mark (Linux), so every stage reports its own peak."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def peak_rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # Sin /proc: pico de todo el proceso (ru_maxrss está en KB en Linux y en bytes en macOS)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def arrow_bytes(data):
+    """Size of a frame as an Arrow IPC stream, the format Streamlit sends tables and chart data in."""
+    frame = data.to_frame() if isinstance(data, pd.Series) else data
+    table = pa.Table.from_pandas(frame)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().size
+
+
+def directory_bytes(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def run_stage(stages, name, func):
+    """Run one stage and record its wall time, peak RSS and the payload sizes it returns."""
+    gc.collect()
+    reset_peak_rss()
+    started = time.perf_counter()
+    value, payload = func()
+    stages[name] = {'seconds': round(time.perf_counter() - started, 4), 'peak_rss_mb': round(peak_rss_mb(), 1),
+                    'payload': payload}
+    print(f"   {name:<20} {stages[name]['seconds']:>9.3f} s {stages[name]['peak_rss_mb']:>9.1f} MB  {payload}")
+    return value
+
+
+def dashboard_filters(index, days=None, statuses=None):
+    """The Dashboard's default selection (every option, whole created_at range), optionally narrowed."""
+    min_date, max_date = date_bounds(index['dates']['created_at'])
+    end = pd.Timestamp(max_date).normalize() + pd.Timedelta(days=1)
+    start = pd.Timestamp(min_date).normalize() if days is None else end - pd.Timedelta(days=days)
+    return {
+        'cases_status': statuses or distinct_values(index, 'cases', 'cases_status'),
+        'assignee_name': distinct_values(index, 'cases', 'assignee_name'),
+        'risk_level': distinct_values(index, 'cases', 'risk_level'),
+        'check_status_original': distinct_values(index, 'checks', 'check_status_original'),
+        'check_type': distinct_values(index, 'checks', 'check_type'),
+        'country': distinct_values(index, 'individuals', 'country'),
+        'is_pep': None,
+        'date_column': 'created_at',
+        'start': start,
+        'end': end,
+    }
+
+
+def dashboard(state, filters):
+    """One Dashboard rerun: masks, joined rows, KPIs / series (rollup or tables), charts and the first page."""
+    cases, checks = state['tables']['cases'], state['tables']['checks']
+    masks = filter_masks(state['filter_index'], filters)
+    positions = np.flatnonzero(rows_mask(masks, state['positions']))
+    summary = rollup_answer(state['rollup'], state['filter_index'], filters)
+    from_rollup = summary is not None
+    if summary is None:
+        summary = tables_answer(cases, checks, masks, filters['date_column'])
+    charts = [summary[name].pivot(index="Month", columns="assignee_name", values=value).fillna(0)
+              for name, value in [('monthly_cases', "Case Count"), ('monthly_checks', "Check Count")]
+              if not summary[name].empty]
+    tables = [summary['cases_by_status'].unstack(fill_value=0), summary['checks_by_status'].unstack(fill_value=0)]
+    page = frame_source(state['df'], positions)['page']("", None, False, 0, PAGE_ROWS)
+    return positions, {'rows': len(positions), 'total_cases': int(summary['total_cases']), 'from_rollup': from_rollup,
+                       'chart_bytes': sum(map(arrow_bytes, charts)), 'table_bytes': sum(map(arrow_bytes, tables)),
+                       'page_bytes': arrow_bytes(page)}
+
+
+def advanced_stats(state, today):
+    """Every agent's and the team's metrics, then the busiest agent's chart frames and first page."""
+    tables = state['tables']
+    stats = compute_agent_stats(state['df'], state['lifecycle'], tables['checks'], today)
+    agent = max(stats['agent_rows'], key=lambda name: len(stats['agent_rows'][name]))
+    charts = [pd.concat([lookup(stats[result], 'agent', agent), lookup(stats[result], 'team', TEAM_GROUP)])
+              for result in ['case_trend', 'check_trend', 'resolution_trend', 'resolution_box', 'resolution_outliers']]
+    charts += [lookup(stats['aging_bins'], 'agent', agent), lookup(stats['oldest_open'], 'agent', agent)]
+    page = frame_source(state['df'], agent_rows(stats, agent))['page']("", None, False, 0, PAGE_ROWS)
+    return stats, {'agents': len(stats['agent_rows']), 'chart_bytes': sum(map(arrow_bytes, charts)),
+                   'page_bytes': arrow_bytes(page)}
+
+
+def kyc(index, df, today):
+    """A KYC rerun per date window (options and KPIs), plus an open-cases selection on the whole history."""
+    for date_filter in DATE_WINDOWS:
+        positions = window_positions(index, date_filter, today)
+        for col in KYC_SELECT_COLUMNS:
+            filter_options(index, col, positions)
+        kyc_kpis(index, positions)
+    selections = dict.fromkeys(KYC_SELECT_COLUMNS, "All")
+    selections['cases_status'] = "open"
+    positions = apply_filters(index, window_positions(index, "Historical Data", today), selections)
+    kpis = kyc_kpis(index, positions)
+    page = frame_source(df, positions)['page']("", None, False, 0, PAGE_ROWS)
+    return positions, {'rows': len(positions), 'kpis': kpis, 'page_bytes': arrow_bytes(page)}
+
+
+def export_csv(df, positions, work):
+    path = os.path.join(work, "export.csv")
+    write_export(iter_chunks(df, positions), 'csv', path)
+    return None, {'rows': len(positions), 'bytes': os.path.getsize(path)}
+
+
+def render_pages(work):
+    """Time main.py's pages end to end with Streamlit's AppTest, on the files in ``work``."""
+    from streamlit.testing.v1 import AppTest
+    script = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+    timings = {}
+    cwd = os.getcwd()
+    os.chdir(work)
+    try:
+        app = AppTest.from_file(script, default_timeout=3600)
+        for page in PAGES:
+            started = time.perf_counter()
+            app = app.run() if page == PAGES[0] else app.sidebar.radio[0].set_value(page).run()
+            first = time.perf_counter() - started
+            started = time.perf_counter()
+            app.run()
+            timings[page] = {'first_seconds': round(first, 4), 'rerun_seconds': round(time.perf_counter() - started, 4),
+                             'exceptions': len(app.exception)}
+    finally:
+        os.chdir(cwd)
+    return None, timings
+
+
+def bench_size(target_rows, seed, pages, keep):
+    """All the stages for one synthetic dataset size; returns its result record."""
+    work = tempfile.mkdtemp(prefix="dashboard_bench_")
+    stages = {}
+    today = pd.Timestamp.now().normalize()
+    snapshot = os.path.join(work, SNAPSHOT_FILE)
+    print(f"📏 {target_rows:,} filas → {work}")
+    try:
+        def refresh_snapshot():
+            rows = write_snapshot(generate_rows(target_rows, seed), path=snapshot, csv_path=os.path.join(work, CSV_FILE))
+            return rows, {'rows': rows, 'snapshot_bytes': os.path.getsize(snapshot),
+                          'csv_bytes': os.path.getsize(os.path.join(work, CSV_FILE))}
+
+        def refresh_derive():
+            update_data.derive_files(work)
+            return None, {'partitions_bytes': directory_bytes(os.path.join(work, PARTITION_DIR)),
+                          'lifecycle_bytes': os.path.getsize(os.path.join(work, LIFECYCLE_FILE)),
+                          'rollup_bytes': os.path.getsize(os.path.join(work, ROLLUP_FILE))}
+
+        def load_data():
+            df, _ = prepare_dataset(read_snapshot(snapshot))
+            return df, {'rows': len(df), 'memory_bytes': int(df.memory_usage(deep=True).sum())}
+
+        def prepare():
+            tables = prepare_tables(read_tables(work))
+            state = {'df': df, 'tables': tables, 'filter_index': build_filter_index(tables),
+                     'positions': row_positions(df, tables),
+                     'lifecycle': read_lifecycle(os.path.join(work, LIFECYCLE_FILE)),
+                     'rollup': read_rollup(os.path.join(work, ROLLUP_FILE))}
+            return state, {name: len(table) for name, table in tables.items()}
+
+        rows = run_stage(stages, 'refresh_snapshot', refresh_snapshot)
+        run_stage(stages, 'refresh_derive', refresh_derive)
+        df = run_stage(stages, 'load_data', load_data)
+        state = run_stage(stages, 'prepare', prepare)
+        positions = run_stage(stages, 'dashboard', lambda: dashboard(state, dashboard_filters(state['filter_index'])))
+        run_stage(stages, 'dashboard_narrow', lambda: dashboard(
+            state, dashboard_filters(state['filter_index'], days=45, statuses=['open'])))
+        run_stage(stages, 'advanced_stats', lambda: advanced_stats(state, today))
+        kyc_index = run_stage(stages, 'kyc_index', lambda: (build_kyc_index(df), {}))
+        run_stage(stages, 'kyc', lambda: kyc(kyc_index, df, today.to_pydatetime()))
+        run_stage(stages, 'export_csv', lambda: export_csv(df, positions, work))
+        if pages:
+            del state, kyc_index, df
+            run_stage(stages, 'pages', lambda: render_pages(work))
+        return {'target_rows': target_rows, 'rows': rows, 'stages': stages}
+    finally:
+        if not keep:
+            shutil.rmtree(work, ignore_errors=True)
+
+
+def bench_extraction(n_cases, seed, parallelism, keep):
+    """The refresh job end to end against a SQLite copy of the source tables."""
+    work = tempfile.mkdtemp(prefix="dashboard_bench_extract_")
+    stages = {}
+    print(f"🗄️ Extracción: {n_cases:,} casos en SQLite → {work}")
+    engine = sqlite_engine(os.path.join(work, "source.db"))
+    cwd = os.getcwd()
+    try:
+        def fixture_load():
+            counts = load_fixture(engine, n_cases, seed)
+            return counts, {'source_bytes': os.path.getsize(os.path.join(work, "source.db")), **counts}
+
+        def refresh(**options):
+            update_data.fetch_and_save_data(engine=engine, **options)
+            version = current_version()
+            manifest = read_version_manifest(version)
+            return None, {'rows': manifest['row_counts']['rows'], 'mode': manifest['mode'],
+                          'version_bytes': directory_bytes(version_path(version))}
+
+        counts = run_stage(stages, 'fixture_load', fixture_load)
+        os.chdir(work)
+
+        run_stage(stages, 'extract_full', lambda: refresh(full=True))
+        run_stage(stages, 'extract_parallel', lambda: refresh(full=True, parallelism=parallelism, partition_by="month"))
+        run_stage(stages, 'extract_incremental', lambda: refresh())
+        return {'cases': n_cases, 'source_rows': counts, 'stages': stages}
+    finally:
+        os.chdir(cwd)
+        engine.dispose()
+        if not keep:
+            shutil.rmtree(work, ignore_errors=True)
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(RESULTS_DIR)).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'host': socket.gethostname(),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'cpus': os.cpu_count(),
+        'pandas': pd.__version__,
+        'pyarrow': pa.__version__,
+        'numpy': np.__version__,
+        'git_commit': commit,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the refresh job and the dashboard pages on synthetic data")
+    parser.add_argument("--rows", default=DEFAULT_SIZES,
+                        help="Comma-separated dataset sizes in joined rows (e.g. 10k,100k,1M,20M)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic generator")
+    parser.add_argument("--extract-cases", type=int, default=2000,
+                        help="Cases in the SQLite fixture for the extraction stages (0 skips them)")
+    parser.add_argument("--parallel", type=int, default=4, help="Workers for the parallel extraction stage")
+    parser.add_argument("--pages", action="store_true", help="Also render every page of main.py with AppTest")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/<UTC time>.json)")
+    parser.add_argument("--keep", action="store_true", help="Keep the generated working directories")
+    args = parser.parse_args()
+
+    started_at = datetime.now(timezone.utc)
+    results = {'started_at': started_at.isoformat(), 'environment': environment(), 'seed': args.seed,
+               'sizes': [bench_size(parse_size(size), args.seed, args.pages, args.keep) for size in args.rows.split(",")]}
+    if args.extract_cases > 0:
+        results['extraction'] = bench_extraction(args.extract_cases, args.seed, args.parallel, args.keep)
+
+    output = args.output or os.path.join(RESULTS_DIR, started_at.strftime("%Y%m%dT%H%M%SZ") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2, default=str)
+    print(f"✅ Resultados en {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import numpy as np
+import pandas as pd
+
+# Mezclas de valores con la forma del dataset real: (valores, probabilidades)
+CASE_STATUSES = (['open', 'approved', 'rejected', 'closed'], [0.22, 0.5, 0.18, 0.1])
+CASE_TAGS = (['{Individual}', '{business}', '{"True Match - PEP",Individual}', '{Employee}', '{VIP_Customer}',
+              '{"POA Lookback (1.14.2025)",Individual}', '{}', None],
+             [0.46, 0.2, 0.03, 0.08, 0.03, 0.1, 0.05, 0.05])
+RISK_LEVELS = (['low', 'medium', 'high', None], [0.5, 0.3, 0.12, 0.08])
+CHECK_TYPES = (['aml', 'id_verification', 'id_document', 'document'], [0.35, 0.3, 0.2, 0.15])
+CHECK_STATUSES = (['approved', 'rejected', 'need_review', 'in_progress', 'processing'], [0.55, 0.1, 0.2, 0.1, 0.05])
+PENDING_CHECK_STATUSES = ['need_review', 'in_progress', 'processing']
+COUNTRIES = (['DO', 'US', 'MX', 'ES', 'CO', 'PR', 'VE', 'BR', None], [0.3, 0.25, 0.12, 0.08, 0.08, 0.06, 0.05, 0.04, 0.02])
+EMPLOYMENT_STATUSES = (['employed', 'self_employed', 'unemployed', 'student', 'retired', None],
+                       [0.5, 0.2, 0.1, 0.08, 0.07, 0.05])
+
+# Individuos por caso, y checks y direcciones por individuo: 1..n veces con estas probabilidades
+INDIVIDUALS_PER_CASE = [0.75, 0.2, 0.05]
+CHECKS_PER_INDIVIDUAL = [0.3, 0.4, 0.2, 0.1]
+ADDRESSES_PER_INDIVIDUAL = [0.8, 0.2]
+# Filas unidas (caso x individuo x check x dirección) por caso, en promedio
+ROWS_PER_CASE = float(np.dot(np.arange(1, 4), INDIVIDUALS_PER_CASE) * np.dot(np.arange(1, 5), CHECKS_PER_INDIVIDUAL)
+                      * np.dot(np.arange(1, 3), ADDRESSES_PER_INDIVIDUAL))
+
+AGENTS = 40
+HORATIO_AGENTS = 24
+UNASSIGNED_SHARE = 0.08
+PEP_SHARE = 0.04
+# Días de historia hacia atrás y días medios hasta la última actividad de un caso
+HISTORY_DAYS = 730
+ACTIVITY_DAYS = 12
+MISSING_CREATED_SHARE = 0.001
+# Casos por bloque generado; acota la memoria del generador
+BLOCK_CASES = 50000
+
+HEX_DIGITS = np.frombuffer(b"0123456789abcdef", dtype=np.uint8)
+UUID_DIGIT_POSITIONS = [i for i in range(36) if i not in (8, 13, 18, 23)]
+
+
+def make_ids(rng, size):
+    """Random IDs in UUID text form, like the source tables' keys."""
+    text = np.full((size, 36), ord('-'), dtype=np.uint8)
+    text[:, UUID_DIGIT_POSITIONS] = HEX_DIGITS[rng.integers(0, 16, size=(size, 32), dtype=np.uint8)]
+    return text.view('S36').ravel().astype(str).astype(object)
+
+
+def choose(rng, spec, size):
+    values, weights = spec
+    return np.array(values, dtype=object)[rng.choice(len(values), size=size, p=weights)]
+
+
+def fan_out(rng, parents, weights):
+    """The parent position of every child, each of ``parents`` getting 1..len(weights) children."""
+    counts = rng.choice(np.arange(1, len(weights) + 1), size=parents, p=weights)
+    return np.repeat(np.arange(parents), counts)
+
+
+def source_tables(rng, n_cases, now):
+    """One block of the four source tables the extraction query joins (dotfile_cases, ...)."""
+    case_ids = make_ids(rng, n_cases)
+    created = pd.Series(now - pd.to_timedelta(rng.uniform(0, HISTORY_DAYS, n_cases), unit='D').round('s'))
+    last_activity = (created + pd.to_timedelta(rng.exponential(ACTIVITY_DAYS, n_cases), unit='D').round('s')).clip(upper=now)
+    missing = rng.random(n_cases) < MISSING_CREATED_SHARE
+    agent = rng.integers(0, AGENTS, n_cases)
+    unassigned = rng.random(n_cases) < UNASSIGNED_SHARE
+    names = np.array([f"Agent {i + 1:02d}" for i in range(AGENTS)], dtype=object)
+    emails = np.array([f"agent{i + 1:02d}@{'hirehoratio.co' if i < HORATIO_AGENTS else 'partner.example'}"
+                       for i in range(AGENTS)], dtype=object)
+    status = choose(rng, CASE_STATUSES, n_cases)
+    cases = pd.DataFrame({
+        'id': case_ids,
+        'status': status,
+        'tags': choose(rng, CASE_TAGS, n_cases),
+        'assignee_fullname': np.where(unassigned, None, names[agent]),
+        'assignee_email': np.where(unassigned, None, emails[agent]),
+        'created_at': created.mask(missing),
+        'last_activity_at': last_activity,
+        'risk_level': choose(rng, RISK_LEVELS, n_cases),
+    })
+
+    individual_case = fan_out(rng, n_cases, INDIVIDUALS_PER_CASE)
+    individual_ids = make_ids(rng, len(individual_case))
+    individuals = pd.DataFrame({
+        'id': individual_ids,
+        'case_id': case_ids[individual_case],
+        'is_pep': rng.random(len(individual_ids)) < PEP_SHARE,
+        'employment_status': choose(rng, EMPLOYMENT_STATUSES, len(individual_ids)),
+    })
+
+    check_individual = fan_out(rng, len(individual_ids), CHECKS_PER_INDIVIDUAL)
+    check_status = choose(rng, CHECK_STATUSES, len(check_individual))
+    # Los casos ya decididos no tienen checks pendientes
+    decided = status[individual_case][check_individual] != 'open'
+    check_status[decided & np.isin(check_status, PENDING_CHECK_STATUSES)] = 'approved'
+    checks = pd.DataFrame({
+        'id': make_ids(rng, len(check_individual)),
+        'individual_id': individual_ids[check_individual],
+        'type': choose(rng, CHECK_TYPES, len(check_individual)),
+        'status': check_status,
+    })
+
+    address_individual = fan_out(rng, len(individual_ids), ADDRESSES_PER_INDIVIDUAL)
+    addresses = pd.DataFrame({
+        'id': make_ids(rng, len(address_individual)),
+        'individual_id': individual_ids[address_individual],
+        'country': choose(rng, COUNTRIES, len(address_individual)),
+    })
+    return {'dotfile_cases': cases, 'dotfile_individuals': individuals, 'dotfile_checks': checks,
+            'dotfile_addresses': addresses}
+
+
+def joined_rows(tables):
+    """The 15 columns of update_data.BASE_QUERY for one block of source tables, in the same join."""
+    cases = tables['dotfile_cases'].rename(columns={
+        'id': 'case_id', 'status': 'cases_status', 'tags': 'entity_type', 'assignee_fullname': 'assignee_name',
+        'last_activity_at': 'last_activity_cases'})
+    individuals = tables['dotfile_individuals'].rename(columns={'id': 'individual_id'})
+    checks = tables['dotfile_checks'].rename(columns={'id': 'check_id', 'type': 'check_type', 'status': 'check_status'})
+    addresses = tables['dotfile_addresses'][['individual_id', 'country']]
+    rows = (cases.merge(individuals, on='case_id')
+            .merge(checks, on='individual_id')
+            .merge(addresses, on='individual_id'))
+    return rows[['case_id', 'individual_id', 'cases_status', 'check_type', 'check_id', 'check_status', 'entity_type',
+                 'assignee_name', 'assignee_email', 'created_at', 'last_activity_cases', 'risk_level', 'is_pep',
+                 'employment_status', 'country']]
+
+
+def source_blocks(n_cases, seed=0, now=None, block_cases=BLOCK_CASES):
+    """Source tables for ``n_cases`` cases, block by block; the same seed gives the same data."""
+    now = pd.Timestamp.now().normalize() if now is None else pd.Timestamp(now)
+    for block, start in enumerate(range(0, n_cases, block_cases)):
+        yield source_tables(np.random.default_rng([seed, block]), min(block_cases, n_cases - start), now)
+
+
+def generate_rows(target_rows, seed=0, now=None, block_cases=BLOCK_CASES):
+    """Chunks of the joined extraction result, about ``target_rows`` rows in total (whole cases)."""
+    n_cases = max(1, round(target_rows / ROWS_PER_CASE))
+    for tables in source_blocks(n_cases, seed, now, block_cases):
+        yield joined_rows(tables)
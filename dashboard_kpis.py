@@ -0,0 +1,203 @@
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from data_store import DATE_COLUMNS, PENDING_CHECK_STATUSES, SNAPSHOT_BATCH_ROWS, table_paths
+from filter_index import distinct_values
+
+# Conteos del Dashboard por mes que escribe el refresh junto a las tablas
+ROLLUP_FILE = "Data_rollup.parquet"
+
+# Case dimensions of the rollup cells, besides the date field and the month
+ROLLUP_DIMENSIONS = ['assignee_name', 'cases_status', 'risk_level']
+
+# Filtros que el rollup no desglosa: solo puede responder cuando están completos
+ROLLUP_FULL_FILTERS = [('checks', 'check_status_original'), ('checks', 'check_type'), ('individuals', 'country')]
+
+
+def plain_levels(counts):
+    """``counts`` indexed by plain values rather than categories (as the SQL summary is)."""
+    counts.index = counts.index.set_levels([level.astype(object) for level in counts.index.levels])
+    return counts
+
+
+def group_sizes(frame, by):
+    """Rows per group, indexed by plain values rather than categories."""
+    return plain_levels(frame.groupby(by, observed=True).size())
+
+
+def tables_answer(cases, checks, masks, date_column):
+    """Dashboard KPIs, monthly series and assignee tables from the filtered cases and checks tables.
+
+    The tables hold one row per case / check, so counts are plain row counts.
+    """
+    cases_filtered = cases[masks['cases']]
+    checks_filtered = checks[masks['checks']]
+    cases_filtered = cases_filtered.assign(Month=cases_filtered[date_column].dt.to_period('M').astype(str))
+    checks_filtered = checks_filtered.merge(cases_filtered[['case_id', 'Month', 'assignee_name']], on='case_id')
+    return {
+        'case_counts': cases_filtered['cases_status'].value_counts(),
+        'total_cases': len(cases_filtered),
+        'check_counts': checks_filtered['check_status_kpi'].value_counts(),
+        'total_checks': len(checks_filtered),
+        'monthly_cases': cases_filtered.groupby(['Month', 'assignee_name'], observed=True).size().reset_index(name='Case Count'),
+        'monthly_checks': checks_filtered.groupby(['Month', 'assignee_name'], observed=True).size().reset_index(name='Check Count'),
+        'cases_by_status': group_sizes(cases_filtered, ['assignee_name', 'cases_status']),
+        'checks_by_status': group_sizes(checks_filtered, ['assignee_name', 'check_status_original']),
+    }
+
+
+def month_counts(frame, months, level):
+    """Rows of ``frame`` per date field x month x its columns; rows without a month are left out."""
+    cells = [frame.assign(date_field=date_field, month=month)
+             .groupby(['date_field', 'month'] + list(frame.columns), observed=True).size()
+             .rename('count').reset_index()
+             for date_field, month in months.items()]
+    return pd.concat(cells, ignore_index=True).assign(level=level)
+
+
+def build_rollup(cases, directory=".", batch_rows=SNAPSHOT_BATCH_ROWS):
+    """Count the cases and checks that pass the default filters, per date field x month x case dimensions.
+
+    A check passes when its status and type are set and its individual has an address with a
+    country; a case passes when it has a passing check (the same rules as ``compute_masks`` with
+    every value selected). Checks are also split by status. The checks and individuals tables
+    are streamed in batches. Returns None when the tables lack a column the rollup needs.
+    """
+    paths = table_paths(directory)
+    checks_file, individuals_file = pq.ParquetFile(paths['checks']), pq.ParquetFile(paths['individuals'])
+    if ({'check_status', 'check_type'} - set(checks_file.schema_arrow.names)
+            or 'country' not in individuals_file.schema_arrow.names):
+        return None
+
+    # Individuos con al menos una dirección con país
+    located = [batch.to_pandas().dropna().drop_duplicates()['individual_id']
+               for batch in individuals_file.iter_batches(batch_size=batch_rows, columns=['individual_id', 'country'])]
+    located = pd.Index(pd.concat(located, ignore_index=True).unique() if located else [])
+
+    dimensions = cases[[col for col in ROLLUP_DIMENSIONS if col in cases.columns]]
+    months = {col: cases[col].dt.to_period('M').astype(str).where(cases[col].notna()).to_numpy()
+              for col in DATE_COLUMNS if col in cases.columns}
+    case_index = pd.Index(cases['case_id'])
+    has_check = np.zeros(len(cases), dtype=bool)
+    check_cells = []
+    for batch in checks_file.iter_batches(batch_size=batch_rows,
+                                          columns=['case_id', 'individual_id', 'check_type', 'check_status']):
+        checks = batch.to_pandas()
+        positions = case_index.get_indexer(checks['case_id'])
+        passing = ((positions >= 0) & checks['check_type'].notna().to_numpy()
+                   & checks['check_status'].notna().to_numpy() & (located.get_indexer(checks['individual_id']) >= 0))
+        positions = positions[passing]
+        has_check[positions] = True
+        frame = (dimensions.iloc[positions].reset_index(drop=True)
+                 .assign(check_status_original=checks['check_status'].astype(object).to_numpy()[passing]))
+        check_cells.append(month_counts(frame, {col: month[positions] for col, month in months.items()}, 'checks'))
+
+    case_cells = month_counts(dimensions[has_check].reset_index(drop=True),
+                              {col: month[has_check] for col, month in months.items()}, 'cases')
+    if check_cells:
+        # Sumar los conteos parciales de cada lote
+        check_cells = pd.concat(check_cells, ignore_index=True)
+        keys = [col for col in check_cells.columns if col != 'count']
+        check_cells = check_cells.groupby(keys, observed=True)['count'].sum().reset_index()
+    else:
+        check_cells = case_cells.iloc[:0].assign(check_status_original=pd.Series(dtype=object), level='checks')
+    rollup = pd.concat([case_cells, check_cells], ignore_index=True)
+    rollup['check_status_original'] = rollup['check_status_original'].astype('category')
+    rollup.attrs['sizes'] = {'cases': len(cases), 'checks': checks_file.metadata.num_rows}
+    return rollup
+
+
+def write_rollup(cases, directory=".", path=None):
+    """Build the rollup from the tables in ``directory`` and write it (by default to its ROLLUP_FILE)."""
+    path = path or os.path.join(directory, ROLLUP_FILE)
+    rollup = build_rollup(cases, directory)
+    if rollup is None:
+        if os.path.exists(path):
+            os.remove(path)
+        return None
+    table = pa.Table.from_pandas(rollup, preserve_index=False)
+    # Tamaños de las tablas de las que salió, para detectar un rollup desfasado
+    metadata = dict(table.schema.metadata or {})
+    metadata[b'rollup_sizes'] = f"{rollup.attrs['sizes']['cases']},{rollup.attrs['sizes']['checks']}".encode()
+    pq.write_table(table.replace_schema_metadata(metadata), path + ".tmp", compression="zstd")
+    os.replace(path + ".tmp", path)
+    return len(rollup)
+
+
+def read_rollup(path=ROLLUP_FILE):
+    """Read the rollup, or None when it is missing."""
+    if not os.path.exists(path):
+        return None
+    table = pq.read_table(path)
+    n_cases, n_checks = (int(n) for n in table.schema.metadata[b'rollup_sizes'].decode().split(','))
+    rollup = table.to_pandas()
+    rollup.attrs['sizes'] = {'cases': n_cases, 'checks': n_checks}
+    return rollup
+
+
+def count_in_range(date_index, start, end):
+    """Number of indexed rows with start <= date < end."""
+    values = date_index['values']
+    return values.searchsorted(np.datetime64(end), side='left') - values.searchsorted(np.datetime64(start), side='left')
+
+
+def covered_months(date_index, start, end):
+    """Months selected by [start, end) if the range covers them whole, else None.
+
+    The rollup only knows months, so it can answer a date filter only when no row in a
+    touched month falls outside the range.
+    """
+    first = pd.Timestamp(start).to_period('M')
+    last = (pd.Timestamp(end) - pd.Timedelta(microseconds=1)).to_period('M')
+    if last < first:
+        return None
+    whole = count_in_range(date_index, first.start_time, (last + 1).start_time)
+    if whole != count_in_range(date_index, start, end):
+        return None
+    return [str(month) for month in pd.period_range(first, last, freq='M')]
+
+
+def rollup_answer(rollup, filter_index, filters):
+    """The same summary as ``tables_answer``, from the rollup; None to fall back to the tables.
+
+    Falls back when there is no rollup, when it does not match the loaded tables, when a check
+    status, check type, country or PEP filter is narrowed, or when the date range cuts through
+    a month.
+    """
+    sizes = filter_index['sizes']
+    if rollup is None or rollup.attrs.get('sizes') != {'cases': sizes['cases'], 'checks': sizes['checks']}:
+        return None
+    if filters['is_pep'] is not None:
+        return None
+    for table, col in ROLLUP_FULL_FILTERS:
+        if set(filters[col]) != set(distinct_values(filter_index, table, col)):
+            return None
+    months = covered_months(filter_index['dates'][filters['date_column']], filters['start'], filters['end'])
+    if months is None:
+        return None
+
+    mask = (rollup['date_field'] == filters['date_column']).to_numpy() & rollup['month'].isin(months).to_numpy()
+    for col in ROLLUP_DIMENSIONS:
+        if col in rollup.columns:
+            mask &= rollup[col].isin(filters[col]).to_numpy()
+    cells = rollup[mask].rename(columns={'month': 'Month'})
+    case_cells = cells[cells['level'] == 'cases']
+    check_cells = cells[cells['level'] == 'checks']
+    check_status_kpi = check_cells['check_status_original'].astype(object).replace(PENDING_CHECK_STATUSES, 'pending')
+
+    def total(frame, by):
+        return frame.groupby(by, observed=True)['count'].sum()
+
+    return {
+        'case_counts': total(case_cells, 'cases_status').sort_values(ascending=False),
+        'total_cases': int(case_cells['count'].sum()),
+        'check_counts': total(check_cells.assign(check_status_kpi=check_status_kpi), 'check_status_kpi')
+        .sort_values(ascending=False),
+        'total_checks': int(check_cells['count'].sum()),
+        'monthly_cases': total(case_cells, ['Month', 'assignee_name']).reset_index(name='Case Count'),
+        'monthly_checks': total(check_cells, ['Month', 'assignee_name']).reset_index(name='Check Count'),
+        'cases_by_status': plain_levels(total(case_cells, ['assignee_name', 'cases_status'])),
+        'checks_by_status': plain_levels(total(check_cells, ['assignee_name', 'check_status_original'])),
+    }
@@ -0,0 +1,86 @@
+import math
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+PAGE_SIZES = [25, 50, 100, 250]
+NO_SORT = "(none)"
+
+
+def search_mask(data, text, positions):
+    """Which of the rows at ``positions`` have a text-like column containing ``text`` (case-insensitive).
+
+    Categorical columns are matched on their categories and mapped back through the codes,
+    so the string search runs over the distinct values only.
+    """
+    mask = np.zeros(len(positions), dtype=bool)
+    for col in data.columns:
+        series = data[col].iloc[positions]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            hits = series.cat.categories.astype(str).str.contains(text, case=False, regex=False)
+            mask |= np.isin(series.cat.codes.to_numpy(), np.flatnonzero(hits))
+        elif pd.api.types.is_string_dtype(series) or series.dtype == object:
+            mask |= series.astype('string').str.contains(text, case=False, regex=False).fillna(False).to_numpy(dtype=bool)
+    return mask
+
+
+def page_positions(data, rows, sort_by, descending, start, stop):
+    """Positions in ``data`` of the current page of ``rows``, sorting only the sort column."""
+    if sort_by == NO_SORT:
+        return rows[start:stop]
+    column = data[sort_by].iloc[rows].reset_index(drop=True)
+    ordered = column.sort_values(ascending=not descending, kind='stable', na_position='last')
+    return rows[ordered.index.to_numpy()[start:stop]]
+
+
+def frame_source(data, positions=None):
+    """Row source over an in-memory frame, or over its rows at ``positions``: search and sort run in pandas.
+
+    The selection stays a position array over ``data``; only the searched and sorted columns and
+    the visible page are ever copied out.
+    """
+    if positions is None:
+        positions = np.arange(len(data))
+    found = {}
+
+    def matching(search):
+        if search not in found:
+            found[search] = positions[search_mask(data, search, positions)] if search else positions
+        return found[search]
+
+    def page(search, sort_by, descending, start, stop):
+        return data.iloc[page_positions(data, matching(search), sort_by or NO_SORT, descending, start, stop)]
+
+    return {'columns': list(data.columns), 'count': lambda search: len(matching(search)), 'page': page}
+
+
+def paginated_table(data, key, default_page_size=50):
+    """Render ``data`` one page at a time; search and sort run here, only the visible rows are sent.
+
+    ``data`` is a DataFrame or a row source dict with ``columns``, ``count(search)`` and
+    ``page(search, sort_by, descending, start, stop)`` (sort_by is None for the data order).
+    ``key`` namespaces the widgets so several tables can live on one page.
+    """
+    source = frame_source(data) if isinstance(data, pd.DataFrame) else data
+    controls = st.columns([3, 2, 1, 1, 1])
+    search = controls[0].text_input(":mag: Search rows", key=f"{key}_search").strip()
+    sort_by = controls[1].selectbox("Sort by", [NO_SORT] + list(source['columns']), key=f"{key}_sort")
+    descending = controls[2].checkbox("Descending", key=f"{key}_desc")
+    page_size = controls[3].selectbox("Rows per page", PAGE_SIZES, index=PAGE_SIZES.index(default_page_size),
+                                      key=f"{key}_page_size")
+
+    total = source['count'](search)
+    pages = max(1, math.ceil(total / page_size))
+    # Si los filtros achicaron el resultado, volver a la primera página
+    page_key = f"{key}_page"
+    if st.session_state.get(page_key, 1) > pages:
+        st.session_state[page_key] = 1
+    page = controls[4].number_input("Page", min_value=1, max_value=pages, step=1, key=page_key)
+
+    start = (int(page) - 1) * page_size
+    stop = start + page_size
+    st.dataframe(source['page'](search, None if sort_by == NO_SORT else sort_by, descending, start, stop))
+    if total:
+        st.caption(f"Rows {start + 1:,}–{min(stop, total):,} of {total:,} (page {int(page)} of {pages})")
+    else:
+        st.caption("No rows match.")
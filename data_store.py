@@ -0,0 +1,453 @@
+import os
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from snapshots import link_or_copy
+
+# Snapshot tipado que escribe update_data.py y lee main.py
+SNAPSHOT_FILE = "Data.parquet"
+# Exportación secundaria en texto, para quien siga consumiendo el CSV
+CSV_FILE = "Data.csv"
+
+# Low-cardinality fields stored as dictionary columns (pandas categoricals on read)
+CATEGORY_COLUMNS = ['cases_status', 'check_type', 'check_status', 'risk_level', 'country', 'assignee_name']
+DATE_COLUMNS = ['created_at', 'last_activity_cases']
+# Check statuses that count as 'pending' in the KPIs
+PENDING_CHECK_STATUSES = ['in_progress', 'processing', 'need_review']
+STRING_COLUMNS = ['case_id', 'individual_id', 'check_id', 'entity_type', 'assignee_email', 'employment_status']
+
+# Tablas normalizadas: una fila por caso, por check y por individuo/dirección, unidas por ID
+TABLE_FILES = {
+    'cases': "Data_cases.parquet",
+    'checks': "Data_checks.parquet",
+    'individuals': "Data_individuals.parquet",
+}
+TABLE_COLUMNS = {
+    'cases': ['case_id', 'cases_status', 'entity_type', 'assignee_name', 'assignee_email',
+              'created_at', 'last_activity_cases', 'risk_level'],
+    'checks': ['check_id', 'case_id', 'individual_id', 'check_type', 'check_status'],
+    'individuals': ['individual_id', 'case_id', 'is_pep', 'employment_status', 'country'],
+}
+TABLE_KEYS = {'cases': ['case_id'], 'checks': ['check_id'], 'individuals': None}
+
+# Copia del snapshot partida por mes de created_at, con un manifiesto de mínimos/máximos por partición
+PARTITION_DIR = "Data_parts"
+MANIFEST_FILE = os.path.join(PARTITION_DIR, "manifest.json")
+# Partición de las filas sin created_at
+UNDATED_PARTITION = "undated"
+# Filas por lote al recorrer el snapshot (tablas y particiones), y filas que se acumulan entre
+# particiones antes de escribirlas
+SNAPSHOT_BATCH_ROWS = 65536
+PARTITION_BUFFER_ROWS = 262144
+# Copias sin comprimir (Arrow IPC) del dataset ya preparado, mapeadas en memoria por todos los procesos del host
+SHARED_DATASET = os.environ.get("DASHBOARD_SHARED_DATASET", "0") == "1"
+SHARED_SUFFIX = ".arrow"
+# Tipos que se leen del archivo compartido sin copiarlos (pandas 2 convierte los strings a objetos Python)
+SHARED_TYPES = {pa.string(): pd.StringDtype("pyarrow"), pa.large_string(): pd.StringDtype("pyarrow")}
+
+SNAPSHOT_SCHEMA = pa.schema(
+    [pa.field(col, pa.string()) for col in ['case_id', 'individual_id', 'check_id', 'entity_type',
+                                            'assignee_email', 'employment_status']]
+    + [pa.field(col, pa.dictionary(pa.int32(), pa.string())) for col in CATEGORY_COLUMNS]
+    + [pa.field(col, pa.timestamp('us')) for col in DATE_COLUMNS]
+    + [pa.field('is_pep', pa.bool_())]
+)
+
+
+def to_naive_datetime(series):
+    """Parse a timestamp column and drop the timezone, as the dashboard expects."""
+    return pd.to_datetime(series, errors='coerce', utc=True).dt.tz_localize(None)
+
+
+def normalize_types(df):
+    """Give a raw extraction frame the snapshot's column types."""
+    df = df.copy()
+    df.columns = df.columns.str.strip().str.lower()
+    for col in DATE_COLUMNS:
+        if col in df.columns:
+            df[col] = to_naive_datetime(df[col])
+    if 'entity_type' in df.columns:
+        # Postgres text[] llega como lista; guardarla igual que en el CSV histórico
+        df['entity_type'] = df['entity_type'].map(lambda v: str(v) if isinstance(v, (list, tuple)) else v)
+    for col in STRING_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('string')
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('string').astype('category')
+    if 'is_pep' in df.columns:
+        df['is_pep'] = df['is_pep'].astype('boolean')
+    return df
+
+
+def to_arrow(df):
+    """Convert a normalized frame to an Arrow table using the snapshot schema for known columns."""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    fields = [SNAPSHOT_SCHEMA.field(name) if name in SNAPSHOT_SCHEMA.names else table.schema.field(name)
+              for name in table.column_names]
+    return table.cast(pa.schema(fields))
+
+
+def write_snapshot(chunks, path=SNAPSHOT_FILE, csv_path=CSV_FILE, progress=None):
+    """Write DataFrame chunks to the Parquet snapshot (and the CSV export) as they arrive.
+
+    Both files are written next to their final name and swapped in only once complete.
+    ``progress`` is called with (rows, bytes_written) after every chunk. Returns the row count.
+    """
+    rows = 0
+    writer = None
+    tmp_path = path + ".tmp"
+    tmp_csv = csv_path + ".tmp" if csv_path else None
+    sink = pa.OSFile(tmp_path, "wb")
+    csv_file = open(tmp_csv, "w", newline="") if tmp_csv else None
+    try:
+        for chunk in chunks:
+            chunk = normalize_types(chunk)
+            table = to_arrow(chunk)
+            if writer is None:
+                writer = pq.ParquetWriter(sink, table.schema, compression="zstd")
+            writer.write_table(table.cast(writer.schema))
+            if csv_file is not None:
+                chunk.to_csv(csv_file, header=(rows == 0), index=False)
+            rows += len(chunk)
+            if progress is not None:
+                progress(rows, sink.tell() + (csv_file.tell() if csv_file is not None else 0))
+        if writer is None:
+            writer = pq.ParquetWriter(sink, SNAPSHOT_SCHEMA, compression="zstd")
+    finally:
+        if writer is not None:
+            writer.close()
+        sink.close()
+        if csv_file is not None:
+            csv_file.close()
+    os.replace(tmp_path, path)
+    if tmp_csv:
+        os.replace(tmp_csv, csv_path)
+    return rows
+
+
+def read_snapshot(path=SNAPSHOT_FILE, columns=None):
+    """Read the snapshot memory-mapped; dictionary columns come back as categoricals."""
+    return pd.read_parquet(path, engine="pyarrow", columns=columns, memory_map=True)
+
+
+def read_snapshot_chunks(path=SNAPSHOT_FILE, batch_rows=SNAPSHOT_BATCH_ROWS):
+    """Read the snapshot as frames of ``batch_rows`` rows, so a pass over it does not hold it whole."""
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_rows):
+        yield batch.to_pandas()
+
+
+def snapshot_version(path):
+    """Cheap version key for a snapshot file (size and mtime), used to key the dashboard caches."""
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return f"{path}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def fill_assignee(df):
+    if 'Un-assignee' not in df['assignee_name'].cat.categories:
+        df['assignee_name'] = df['assignee_name'].cat.add_categories('Un-assignee')
+    df['assignee_name'] = df['assignee_name'].fillna('Un-assignee')
+
+
+def add_check_status_kpi(df):
+    df['check_status_original'] = df['check_status']
+    df['check_status_kpi'] = (df['check_status'].astype(object)
+                              .replace(PENDING_CHECK_STATUSES, 'pending').astype('category'))
+
+
+def essential_missing(columns):
+    """Essential dashboard columns absent from ``columns``."""
+    return [col for col in DATE_COLUMNS + ['assignee_name', 'check_status'] if col not in columns]
+
+
+def prepare_dataset(df):
+    """Normalize the snapshot once for the dashboard.
+
+    Returns the prepared frame and the list of essential columns that are missing.
+    """
+    df = normalize_types(df)
+    missing = essential_missing(df.columns)
+    if 'assignee_name' in df.columns:
+        fill_assignee(df)
+    if 'check_status' in df.columns:
+        add_check_status_kpi(df)
+    return df, missing
+
+
+def dedupe_table(df, name):
+    """Reduce a frame holding a table's columns to one row per key."""
+    columns = [col for col in TABLE_COLUMNS[name] if col in df.columns]
+    return df[columns].drop_duplicates(subset=TABLE_KEYS[name]).reset_index(drop=True)
+
+
+def split_tables(df):
+    """Split the joined case x individual x check x address frame into the normalized tables."""
+    return {name: dedupe_table(df, name) for name in TABLE_COLUMNS}
+
+
+def table_paths(directory="."):
+    return {name: os.path.join(directory, file_name) for name, file_name in TABLE_FILES.items()}
+
+
+def first_unseen(hashes, seen):
+    """Mask of the first occurrence of every hash not in the sorted ``seen``, and ``seen`` with those added."""
+    position = np.searchsorted(seen, hashes)
+    known = seen[np.minimum(position, len(seen) - 1)] == hashes if len(seen) else np.zeros(len(hashes), dtype=bool)
+    first = ~pd.Series(hashes).duplicated().to_numpy() & ~known
+    new = np.sort(hashes[first])
+    return first, np.insert(seen, np.searchsorted(seen, new), new)
+
+
+def write_tables(path=SNAPSHOT_FILE, directory=".", batch_rows=SNAPSHOT_BATCH_ROWS):
+    """Derive the normalized tables from the snapshot, streaming only each table's columns.
+
+    Like dedupe_table, the first row of every key is kept (the whole row is the key of tables
+    without one). Keys are compared by their 64-bit hash, so memory follows the batch size and
+    the number of distinct keys rather than the snapshot size.
+    """
+    available = set(pq.read_schema(path).names)
+    for name, table_path in table_paths(directory).items():
+        columns = [col for col in TABLE_COLUMNS[name] if col in available]
+        keys = TABLE_KEYS[name] or columns
+        seen = np.array([], dtype=np.uint64)
+        writer = None
+        try:
+            for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_rows, columns=columns):
+                chunk = batch.to_pandas()
+                hashes = pd.util.hash_pandas_object(chunk[keys], index=False).to_numpy()
+                first, seen = first_unseen(hashes, seen)
+                table = to_arrow(chunk[first])
+                if writer is None:
+                    writer = pq.ParquetWriter(table_path + ".tmp", table.schema, compression="zstd")
+                writer.write_table(table.cast(writer.schema))
+            if writer is None:
+                pq.write_table(to_arrow(pd.read_parquet(path, columns=columns)), table_path + ".tmp",
+                               compression="zstd")
+        finally:
+            if writer is not None:
+                writer.close()
+        os.replace(table_path + ".tmp", table_path)
+
+
+def read_tables(directory=".", names=None):
+    """Read the normalized tables (only ``names``, when given)."""
+    return {name: pd.read_parquet(table_path, engine="pyarrow", memory_map=True)
+            for name, table_path in table_paths(directory).items() if names is None or name in names}
+
+
+def prepare_tables(tables):
+    """Apply the dashboard normalization to the normalized tables (any subset of them)."""
+    tables = {name: normalize_types(table) for name, table in tables.items()}
+    if 'cases' in tables and 'assignee_name' in tables['cases'].columns:
+        fill_assignee(tables['cases'])
+    if 'checks' in tables and 'check_status' in tables['checks'].columns:
+        add_check_status_kpi(tables['checks'])
+    return tables
+
+
+def partition_key(created_at):
+    """Partition name of every row: the created_at month, or UNDATED_PARTITION."""
+    return created_at.dt.to_period('M').astype(str).where(created_at.notna(), UNDATED_PARTITION)
+
+
+def iso_or_none(timestamp):
+    return None if pd.isna(timestamp) else timestamp.isoformat()
+
+
+def read_manifest(path=MANIFEST_FILE):
+    """The partition manifest, or None when the partitioned layout has not been written."""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def partitioned_batches(path, batch_rows=SNAPSHOT_BATCH_ROWS):
+    """Record batches of the snapshot, each with the positions of its rows per partition name."""
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_rows):
+        keys = partition_key(batch.column('created_at').to_pandas()).to_numpy()
+        yield batch, pd.Series(keys).groupby(keys, sort=False).indices
+
+
+def partition_stats(path):
+    """Rows, fingerprint and per-date-column min/max of every partition, in one streamed pass.
+
+    The fingerprint hashes the partition's sorted row hashes, so it depends only on the rows and
+    not on their order in the snapshot (serial and parallel extractions order rows differently)
+    or on how the snapshot is split into batches.
+    """
+    stats = {}
+    for batch, groups in partitioned_batches(path):
+        hashes = pd.util.hash_pandas_object(batch.to_pandas(), index=False).to_numpy()
+        dates = {col: batch.column(col).to_pandas() for col in DATE_COLUMNS if col in batch.schema.names}
+        for name, positions in groups.items():
+            entry = stats.setdefault(name, {'rows': 0, 'hashes': [], 'min': {}, 'max': {}})
+            entry['rows'] += len(positions)
+            entry['hashes'].append(hashes[positions])
+            for col, values in dates.items():
+                part = values.iloc[positions]
+                entry['min'][col] = pd.Series([entry['min'].get(col), part.min()], dtype=values.dtype).min()
+                entry['max'][col] = pd.Series([entry['max'].get(col), part.max()], dtype=values.dtype).max()
+    for entry in stats.values():
+        entry['fingerprint'] = hashlib.sha1(np.sort(np.concatenate(entry.pop('hashes'))).tobytes()).hexdigest()
+    return stats
+
+
+def write_partition_files(path, paths, buffer_rows=PARTITION_BUFFER_ROWS):
+    """Stream the snapshot into one Parquet file per partition in ``paths`` (name -> file path).
+
+    Rows are buffered (as Arrow) across partitions up to ``buffer_rows`` and then written as one
+    row group per partition, so memory follows the batch and buffer sizes, not the snapshot size.
+    """
+    schema = pq.read_schema(path)
+    writers, pending, buffered = {}, {}, 0
+
+    def flush():
+        for name, parts in pending.items():
+            if name not in writers:
+                writers[name] = pq.ParquetWriter(paths[name] + ".tmp", schema, compression="zstd")
+            writers[name].write_table(pa.Table.from_batches(parts, schema=schema))
+        pending.clear()
+
+    try:
+        for batch, groups in partitioned_batches(path):
+            for name, positions in groups.items():
+                if name in paths:
+                    pending.setdefault(name, []).append(batch.take(pa.array(positions)))
+                    buffered += len(positions)
+            if buffered >= buffer_rows:
+                flush()
+                buffered = 0
+        flush()
+    finally:
+        for writer in writers.values():
+            writer.close()
+    for name, part_path in paths.items():
+        os.replace(part_path + ".tmp", part_path)
+
+
+def write_partitions(path=SNAPSHOT_FILE, directory=PARTITION_DIR, previous_directory=None):
+    """Split the snapshot by created_at month and record each partition's date range in the manifest.
+
+    A partition file is rewritten only when its content fingerprint changed; a partition whose
+    rows only moved within the snapshot keeps its previous file and row order. With
+    ``previous_directory`` (the previous version's partitions) unchanged files are hard-linked
+    from there; in place, files of partitions that no longer exist are removed. The snapshot is
+    streamed twice at most (fingerprints, then the changed partitions). Returns the names of the
+    rewritten partitions.
+    """
+    os.makedirs(directory, exist_ok=True)
+    previous_directory = previous_directory or directory
+    manifest_name = os.path.basename(MANIFEST_FILE)
+    manifest_path = os.path.join(directory, manifest_name)
+    previous = (read_manifest(os.path.join(previous_directory, manifest_name)) or {}).get('partitions', {})
+    stats = partition_stats(path)
+    partitions, changed = {}, {}
+    for name in sorted(stats, key=lambda name: (name == UNDATED_PARTITION, name)):
+        file_name = f"{name}.parquet"
+        entry = {
+            'file': file_name,
+            'rows': stats[name]['rows'],
+            'fingerprint': stats[name]['fingerprint'],
+            'min': {col: iso_or_none(value) for col, value in stats[name]['min'].items()},
+            'max': {col: iso_or_none(value) for col, value in stats[name]['max'].items()},
+        }
+        part_path = os.path.join(directory, file_name)
+        previous_path = os.path.join(previous_directory, previous[name]['file']) if name in previous else None
+        if (previous_path is None or previous[name]['fingerprint'] != entry['fingerprint']
+                or not os.path.exists(previous_path)):
+            changed[name] = part_path
+        elif previous_path != part_path:
+            link_or_copy(previous_path, part_path)
+        partitions[name] = entry
+    if changed:
+        write_partition_files(path, changed)
+    if previous_directory == directory:
+        for name, entry in previous.items():
+            if name not in partitions and os.path.exists(os.path.join(directory, entry['file'])):
+                os.remove(os.path.join(directory, entry['file']))
+    manifest = {'columns': [name.strip().lower() for name in pq.read_schema(path).names], 'partitions': partitions}
+    with open(manifest_path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(manifest_path + ".tmp", manifest_path)
+    return list(changed)
+
+
+def overlapping_partitions(manifest, column, start=None, end=None):
+    """Partitions that may hold rows with start <= ``column`` < end, in manifest order.
+
+    Without bounds every partition is returned; with bounds, partitions with no value in
+    ``column`` are skipped.
+    """
+    partitions = manifest['partitions']
+    if start is None and end is None:
+        return list(partitions)
+    names = []
+    for name, entry in partitions.items():
+        first, last = entry['min'].get(column), entry['max'].get(column)
+        if first is None or last is None:
+            continue
+        if (end is None or pd.Timestamp(first) < pd.Timestamp(end)) and (start is None or pd.Timestamp(last) >= pd.Timestamp(start)):
+            names.append(name)
+    return names
+
+
+def read_partitions(names, manifest, directory=PARTITION_DIR, columns=None):
+    """Read only the named partitions, memory-mapped, as one frame (categoricals unified across files)."""
+    tables = [pq.read_table(os.path.join(directory, manifest['partitions'][name]['file']), columns=columns,
+                            memory_map=True) for name in names]
+    if not tables:
+        return SNAPSHOT_SCHEMA.empty_table().to_pandas()
+    return pa.concat_tables(tables).to_pandas()
+
+
+def shared_path(path):
+    return os.path.splitext(path)[0] + SHARED_SUFFIX
+
+
+def write_shared(df, path, version):
+    """Write a prepared frame as an uncompressed Arrow IPC file tagged with its dataset version.
+
+    The file is renamed into place, so processes that mapped an older copy keep reading it.
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), b'dataset_version': repr(version).encode()})
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp, path)
+
+
+def map_shared(path, version):
+    """Memory-map the shared copy of a frame; None when it is missing or was written for another version.
+
+    String, date and numeric columns without nulls are read-only views over the page cache, so every
+    process on the host shares them; only categorical codes and nullable columns are materialized.
+    Strings are mapped to Arrow-backed ``string[pyarrow]`` explicitly: pandas 2 would otherwise copy
+    them into Python string arrays.
+    """
+    if not os.path.exists(path):
+        return None
+    reader = pa.ipc.open_file(pa.memory_map(path))
+    if (reader.schema.metadata or {}).get(b'dataset_version') != repr(version).encode():
+        return None
+    return reader.read_all().to_pandas(split_blocks=True, types_mapper=SHARED_TYPES.get)
+
+
+def shared_frames(paths, version, build):
+    """Frames named like ``paths``, mapped from their shared copies for ``version``.
+
+    If a copy is missing or stale, ``build()`` prepares the frames and they are written first; the
+    built frames are then dropped in favour of the mapped ones.
+    """
+    frames = {name: map_shared(path, version) for name, path in paths.items()}
+    if any(frame is None for frame in frames.values()):
+        for name, frame in build().items():
+            write_shared(frame, paths[name], version)
+        frames = {name: map_shared(path, version) for name, path in paths.items()}
+    return frames
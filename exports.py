@@ -0,0 +1,92 @@
+import os
+import gzip
+import time
+import tempfile
+import threading
+from collections import OrderedDict
+import pyarrow.parquet as pq
+import streamlit as st
+from data_store import to_arrow
+from profiling import record
+
+# Filas por lote al generar una exportación
+EXPORT_CHUNK_ROWS = 100000
+# Exportaciones recientes que se conservan en disco (versión + filtros + formato)
+EXPORT_CACHE_SIZE = 8
+
+EXPORT_FORMATS = {
+    'csv': ("filtered_data.csv", "text/csv"),
+    'csv.gz': ("filtered_data.csv.gz", "application/gzip"),
+    'parquet': ("filtered_data.parquet", "application/vnd.apache.parquet"),
+}
+
+_export_dir = tempfile.mkdtemp(prefix="dashboard_exports_")
+_export_cache = OrderedDict()
+_export_lock = threading.Lock()
+
+
+def iter_chunks(data, positions=None, rows=EXPORT_CHUNK_ROWS):
+    """Slices of ``data``, or of its rows at ``positions`` (at least one, so an empty export still gets its header)."""
+    count = len(data) if positions is None else len(positions)
+    for start in range(0, max(count, 1), rows):
+        yield data.iloc[start:start + rows] if positions is None else data.iloc[positions[start:start + rows]]
+
+
+def write_export(chunks, fmt, path):
+    """Write DataFrame ``chunks`` to ``path`` one by one, so the whole file never sits in memory as text."""
+    if fmt == 'parquet':
+        writer = None
+        try:
+            for chunk in chunks:
+                table = to_arrow(chunk)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema, compression="zstd")
+                writer.write_table(table.cast(writer.schema))
+        finally:
+            if writer is not None:
+                writer.close()
+        return
+    opener = gzip.open if fmt == 'csv.gz' else open
+    with opener(path, "wt", encoding="utf-8", newline="") as f:
+        for i, chunk in enumerate(chunks):
+            chunk.to_csv(f, header=(i == 0), index=False)
+
+
+def export_bytes(data, fmt, cache_key):
+    """Bytes of the export, generated on first request and reused for the same cache key.
+
+    ``data`` is a DataFrame or a function returning an iterable of DataFrame chunks.
+    """
+    key = (cache_key, fmt)
+    with _export_lock:
+        path = _export_cache.get(key)
+        if path is not None:
+            _export_cache.move_to_end(key)
+    if path is None:
+        fd, path = tempfile.mkstemp(dir=_export_dir, suffix="." + fmt)
+        os.close(fd)
+        started = time.perf_counter()
+        write_export(data() if callable(data) else iter_chunks(data), fmt, path)
+        # Se genera al hacer clic, fuera de la ejecución del script: se mide aparte
+        record(f"export.{fmt}", time.perf_counter() - started)
+        with _export_lock:
+            _export_cache[key] = path
+            while len(_export_cache) > EXPORT_CACHE_SIZE:
+                _, old_path = _export_cache.popitem(last=False)
+                if os.path.exists(old_path):
+                    os.remove(old_path)
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def export_buttons(data, cache_key, label, key):
+    """Download buttons for CSV, gzip CSV and Parquet that build the file only when clicked.
+
+    ``cache_key`` must identify the dataset version and the filter selection behind ``data``.
+    """
+    col_csv, col_gz, col_parquet = st.columns(3)
+    for column, fmt, text in [(col_csv, 'csv', label), (col_gz, 'csv.gz', "🗜️ CSV (gzip)"),
+                              (col_parquet, 'parquet', "📦 Parquet")]:
+        file_name, mime = EXPORT_FORMATS[fmt]
+        column.download_button(text, lambda fmt=fmt: export_bytes(data, fmt, cache_key),
+                               file_name, mime, key=f"{key}_{fmt}")
@@ -0,0 +1,181 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+# Cuántas combinaciones de filtros recientes se recuerdan (máscaras ya calculadas)
+MASK_CACHE_SIZE = 32
+
+# Dashboard filter columns, grouped by the normalized table that owns them
+INDEXED_COLUMNS = {
+    'cases': ['cases_status', 'assignee_name', 'risk_level'],
+    'checks': ['check_status_original', 'check_type'],
+    'individuals': ['country', 'is_pep'],
+}
+DATE_COLUMNS = ['created_at', 'last_activity_cases']
+
+
+def build_column_index(series):
+    """Category codes for a column plus one packed bitmap per distinct value.
+
+    ``values`` keeps the order of first appearance, like ``Series.unique()``; nulls get no bitmap.
+    """
+    codes, uniques = pd.factorize(series)
+    bitmaps = {value: np.packbits(codes == i) for i, value in enumerate(uniques)}
+    return {
+        'size': len(codes),
+        'values': list(uniques),
+        'bitmaps': bitmaps,
+        'not_null': np.packbits(codes >= 0),
+    }
+
+
+def value_bits(column_index, selected):
+    """Packed bitmap of the rows whose value is in ``selected`` (an ``isin()`` without the scan)."""
+    selected = set(selected)
+    chosen = [value for value in column_index['values'] if value in selected]
+    others = [value for value in column_index['values'] if value not in selected]
+    if not others:
+        return column_index['not_null']
+    if len(chosen) > len(others):
+        # Más barato quitar los valores no seleccionados que unir los seleccionados
+        excluded = np.bitwise_or.reduce([column_index['bitmaps'][value] for value in others])
+        return column_index['not_null'] & ~excluded
+    if not chosen:
+        return np.zeros_like(column_index['not_null'])
+    return np.bitwise_or.reduce([column_index['bitmaps'][value] for value in chosen])
+
+
+def build_date_index(series):
+    """Row positions sorted by date (nulls dropped) for binary-search range lookups."""
+    values = series.to_numpy()
+    valid = np.flatnonzero(~pd.isna(values))
+    order = valid[np.argsort(values[valid], kind='stable')]
+    return {'size': len(values), 'order': order, 'values': values[order]}
+
+
+def date_range_bits(date_index, start, end):
+    """Packed bitmap of the rows with start <= date < end."""
+    values = date_index['values']
+    lo = values.searchsorted(np.datetime64(start), side='left')
+    hi = values.searchsorted(np.datetime64(end), side='left')
+    mask = np.zeros(date_index['size'], dtype=bool)
+    mask[date_index['order'][lo:hi]] = True
+    return np.packbits(mask)
+
+
+def date_bounds(date_index):
+    values = date_index['values']
+    if len(values) == 0:
+        return pd.NaT, pd.NaT
+    return pd.Timestamp(values[0]), pd.Timestamp(values[-1])
+
+
+def unpack(bits, size):
+    return np.unpackbits(bits, count=size).astype(bool)
+
+
+def build_filter_index(tables):
+    """Build the Dashboard filter index for one dataset version.
+
+    Besides the per-column bitmaps it stores, for every check, the position of its case and
+    individual, so the semi-joins between tables become array lookups instead of ``isin()``
+    over IDs. Joined rows are mapped onto the tables separately (``row_positions``), so the
+    index does not need the joined frame.
+    """
+    cases, checks, individuals = tables['cases'], tables['checks'], tables['individuals']
+    index = {
+        name: {col: build_column_index(tables[name][col]) for col in columns if col in tables[name].columns}
+        for name, columns in INDEXED_COLUMNS.items()
+    }
+    index['dates'] = {col: build_date_index(cases[col]) for col in DATE_COLUMNS if col in cases.columns}
+    index['sizes'] = {name: len(table) for name, table in tables.items()}
+
+    individual_codes, individual_ids = pd.factorize(individuals['individual_id'])
+    index['individual_codes'] = individual_codes
+    index['n_individuals'] = len(individual_ids)
+    index['checks_case_pos'] = pd.Index(cases['case_id']).get_indexer(checks['case_id'])
+    index['checks_individual_pos'] = pd.Index(individual_ids).get_indexer(checks['individual_id'])
+
+    index['mask_cache'] = OrderedDict()
+    index['lock'] = threading.Lock()
+    return index
+
+
+def row_positions(rows, tables):
+    """Position of every joined row's check and address in the tables (-1 when absent)."""
+    individuals = tables['individuals']
+    address_columns = [col for col in individuals.columns if col in rows.columns]
+    address_pos = individuals[address_columns].assign(_pos=np.arange(len(individuals)))
+    return {
+        'check_pos': pd.Index(tables['checks']['check_id']).get_indexer(rows['check_id']),
+        'address_pos': (rows[address_columns].merge(address_pos, on=address_columns, how='left')['_pos']
+                        .fillna(-1).to_numpy(dtype=np.int64)),
+    }
+
+
+def distinct_values(index, table, column):
+    """Cached distinct values of a filter column (the multiselect options)."""
+    return index[table][column]['values']
+
+
+def gather(mask, positions):
+    """mask[positions], treating a missing position (-1) as not matching."""
+    return np.where(positions >= 0, mask[positions], False)
+
+
+def compute_masks(index, filters):
+    sizes = index['sizes']
+    case_bits = date_range_bits(index['dates'][filters['date_column']], filters['start'], filters['end'])
+    for col in index['cases']:
+        case_bits = case_bits & value_bits(index['cases'][col], filters[col])
+    check_bits = (value_bits(index['checks']['check_status_original'], filters['check_status_original'])
+                  & value_bits(index['checks']['check_type'], filters['check_type']))
+    address_bits = value_bits(index['individuals']['country'], filters['country'])
+    if filters['is_pep'] is not None:
+        address_bits = address_bits & value_bits(index['individuals']['is_pep'], [filters['is_pep']])
+
+    case_mask = unpack(case_bits, sizes['cases'])
+    address_mask = unpack(address_bits, sizes['individuals'])
+    individual_ok = np.zeros(index['n_individuals'], dtype=bool)
+    individual_ok[index['individual_codes'][address_mask]] = True
+
+    check_mask = (unpack(check_bits, sizes['checks'])
+                  & gather(case_mask, index['checks_case_pos'])
+                  & gather(individual_ok, index['checks_individual_pos']))
+    # Un caso cuenta solo si le queda al menos un check que pasó los filtros
+    case_has_check = np.zeros(sizes['cases'], dtype=bool)
+    case_has_check[index['checks_case_pos'][check_mask]] = True
+    case_mask = case_mask & case_has_check
+
+    masks = {'cases': case_mask, 'checks': check_mask, 'addresses': address_mask}
+    for mask in masks.values():
+        mask.flags.writeable = False
+    return masks
+
+
+def rows_mask(masks, positions):
+    """Mask of the joined rows (mapped by ``row_positions``) whose check and address pass the filters."""
+    return gather(masks['checks'], positions['check_pos']) & gather(masks['addresses'], positions['address_pos'])
+
+
+def filter_masks(index, filters):
+    """Row masks for the cases, checks and individuals (address) tables; see ``rows_mask`` for joined rows.
+
+    ``filters`` maps each indexed column to its selected values, plus ``date_column``,
+    ``start``, ``end`` (exclusive) and ``is_pep`` (True, False or None for all). The most recent
+    combinations are kept in a small LRU cache shared by every session.
+    """
+    key = tuple(sorted((name, tuple(sorted(map(str, value))) if isinstance(value, (list, tuple, set)) else value)
+                       for name, value in filters.items()))
+    with index['lock']:
+        masks = index['mask_cache'].get(key)
+        if masks is not None:
+            index['mask_cache'].move_to_end(key)
+            return masks
+    masks = compute_masks(index, filters)
+    with index['lock']:
+        index['mask_cache'][key] = masks
+        if len(index['mask_cache']) > MASK_CACHE_SIZE:
+            index['mask_cache'].popitem(last=False)
+    return masks
@@ -0,0 +1,132 @@
+import re
+import numpy as np
+import pandas as pd
+
+# Etiquetas de caso que cuentan como individuo para las alertas de documentos
+INDIVIDUAL_TYPES = {"POA Lookback (1.14.2025)", "Individual", "True Match - PEP", "Employee", "VIP_Customer"}
+KYC_FILTER_COLUMNS = ['cases_status', 'check_type', 'check_status', 'risk_level', 'country']
+# Rango de fechas predefinido -> días hacia atrás (None = todo el histórico)
+DATE_WINDOWS = {"Historical Data": None, "Last 15 Days": 15, "Last Month": 30}
+
+TAG_PATTERN = re.compile(r'"([^"]*)"|\'([^\']*)\'|([^,]+)')
+
+
+def parse_tags(value):
+    """Split a tags value ("{a,b}", "['a', 'b']" or plain text) into a tuple of tags."""
+    if not isinstance(value, str):
+        return ()
+    text = value.strip()
+    if text[:1] in '{[' and text[-1:] in '}]':
+        text = text[1:-1]
+    return tuple(tag.strip() for groups in TAG_PATTERN.findall(text) for tag in groups if tag.strip())
+
+
+def is_individual(tags):
+    """A case tagged with any of the individual types (substring match, as the tags carry dates)."""
+    return any(ind in tag for tag in tags for ind in INDIVIDUAL_TYPES)
+
+
+def is_business(tags):
+    return tags == ('business',)
+
+
+def build_kyc_index(df):
+    """Precompute, once per dataset version, everything the KYC page needs.
+
+    Tags are parsed once per distinct entity_type value, and the individual / business flags are
+    broadcast to the rows through the value codes. Filter columns and IDs become integer codes,
+    and the rows get a created_at order for the date windows.
+    """
+    entity_codes, entity_values = pd.factorize(df['entity_type'])
+    tags = [parse_tags(value) for value in entity_values]
+    individual_value = np.array([is_individual(value_tags) for value_tags in tags], dtype=bool)
+    business_value = np.array([is_business(value_tags) for value_tags in tags], dtype=bool)
+    has_entity = entity_codes >= 0
+
+    columns = {}
+    for col in KYC_FILTER_COLUMNS:
+        codes, values = pd.factorize(df[col])
+        columns[col] = {'codes': codes, 'values': list(values), 'options': list(values)}
+
+    case_codes, case_ids = pd.factorize(df['case_id'])
+    check_codes, check_ids = pd.factorize(df['check_id'])
+    created = df['created_at'].to_numpy()
+    valid = np.flatnonzero(~pd.isna(created))
+    order = valid[np.argsort(created[valid], kind='stable')]
+    return {
+        'size': len(df),
+        'individual_entity': np.where(has_entity, individual_value[entity_codes], False) if len(tags) else has_entity,
+        'business_entity': np.where(has_entity, business_value[entity_codes], False) if len(tags) else has_entity,
+        'columns': columns,
+        'case_codes': case_codes,
+        'check_codes': check_codes,
+        'created_order': order,
+        'created_sorted': created[order],
+    }
+
+
+def window_start(date_filter, today):
+    """First created_at inside the selected date window (None for the whole history)."""
+    days = DATE_WINDOWS[date_filter]
+    return None if days is None else pd.Timestamp(today) - pd.Timedelta(days=days)
+
+
+def window_positions(index, date_filter, today):
+    """Row positions (in dataset order) created inside the selected date window."""
+    cutoff = window_start(date_filter, today)
+    if cutoff is None:
+        return np.arange(index['size'])
+    start = index['created_sorted'].searchsorted(np.datetime64(cutoff), side='left')
+    return np.sort(index['created_order'][start:])
+
+
+def filter_options(index, col, positions):
+    """Distinct non-null values of a column among the given rows, in order of first appearance."""
+    column = index['columns'][col]
+    if len(positions) == index['size']:
+        return column['options']
+    codes = pd.unique(column['codes'][positions])
+    return [column['values'][code] for code in codes if code >= 0]
+
+
+def code_of(index, col, value):
+    """Integer code of a value in a filter column (-2 if it never occurs, so it matches nothing)."""
+    values = index['columns'][col]['values']
+    return values.index(value) if value in values else -2
+
+
+def apply_filters(index, positions, selections):
+    """Keep the rows whose column equals the selected value, for every selection that isn't "All"."""
+    for col, value in selections.items():
+        if value != "All":
+            positions = positions[index['columns'][col]['codes'][positions] == code_of(index, col, value)]
+    return positions
+
+
+def distinct(codes):
+    return int(np.unique(codes).size)
+
+
+def kyc_kpis(index, positions):
+    """The six KYC KPIs for the given rows, from one gather of each code column."""
+    codes = {col: index['columns'][col]['codes'][positions] for col in ['cases_status', 'check_type', 'check_status']}
+
+    def matches(col, *values):
+        return np.isin(codes[col], [code_of(index, col, value) for value in values])
+
+    case_ids = index['case_codes'][positions]
+    check_ids = index['check_codes'][positions]
+    is_open = matches('cases_status', 'open')
+    in_review = matches('check_status', 'need_review')
+    open_in_review = is_open & in_review
+    return {
+        'total_kyc_cases': distinct(case_ids),
+        'completed_kyc_cases': distinct(case_ids[is_open]),
+        'aml_alerts': distinct(check_ids[matches('check_type', 'aml') & in_review
+                                         & matches('cases_status', 'open', 'approved')]),
+        'idv_alerts': distinct(check_ids[matches('check_type', 'id_verification') & open_in_review]),
+        'document_alerts': distinct(check_ids[matches('check_type', 'id_document', 'document') & open_in_review
+                                              & index['individual_entity'][positions]]),
+        'document_alerts_companies': distinct(check_ids[matches('check_type', 'document') & open_in_review
+                                                        & index['business_entity'][positions]]),
+    }
@@ -1,78 +1,293 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import os
 import altair as alt
 import pytz
-from datetime import datetime, date, timedelta
+from datetime import datetime, date
+from filter_index import build_filter_index, distinct_values, date_bounds, filter_masks, row_positions, rows_mask
+from dashboard_kpis import ROLLUP_FILE, tables_answer, read_rollup, rollup_answer
+from snapshots import version_path, read_version_manifest, start_watcher
+from refresh_service import REFRESH_INTERVAL, start_refresh_service
+from agent_stats import (TEAM_GROUP, LIFECYCLE_FILE, compute_agent_stats, lookup, agent_rows, read_lifecycle,
+                         case_lifecycle)
+from data_grid import paginated_table, frame_source
+from exports import export_buttons, iter_chunks
+import sql_backend
+from kyc_metrics import build_kyc_index, window_start, window_positions, filter_options, apply_filters, kyc_kpis
+from profiling import DEBUG_PANEL, start_trace, lap, finish_trace, percentiles, write_metrics
+from data_store import (SNAPSHOT_FILE, CSV_FILE, TABLE_FILES, PARTITION_DIR, MANIFEST_FILE, read_snapshot,
+                        snapshot_version, prepare_dataset, essential_missing, table_paths, read_tables, split_tables,
+                        prepare_tables, read_manifest, overlapping_partitions, read_partitions, SHARED_DATASET,
+                        shared_path, shared_frames)
 
 
+# Convertir una fecha UTC a la hora de República Dominicana
+def to_local_time(utc_dt):
+    rd_tz = pytz.timezone('America/Santo_Domingo')  # Zona horaria UTC-4
+    local_dt = utc_dt.astimezone(rd_tz)  # Convertir a UTC-4
+    return local_dt.strftime('%Y-%m-%d %H:%M:%S UTC-4')
+
 # Obtener la fecha y hora de la última actualización del archivo
 def get_last_update_time(file_path):
     if os.path.exists(file_path):
         last_modified_time = os.path.getmtime(file_path)
         utc_dt = datetime.fromtimestamp(last_modified_time, pytz.utc)  # Convertir a UTC
-        rd_tz = pytz.timezone('America/Santo_Domingo')  # Zona horaria UTC-4
-        local_dt = utc_dt.astimezone(rd_tz)  # Convertir a UTC-4
-        return local_dt.strftime('%Y-%m-%d %H:%M:%S UTC-4')
+        return to_local_time(utc_dt)
     else:
         return "File not found"
 
-# Calcular la última actualización
-last_update = get_last_update_time('Data.csv')
-
 # Configure Streamlit page
 st.set_page_config(page_title="Case Dashboard", layout="wide")
 
-# Load data using cache
-@st.cache_data
-def load_data():
-    df = pd.read_csv('Data.csv', skip_blank_lines=True)
+# Tiempos y memoria de cada sección de esta ejecución del script
+trace = start_trace()
+
+def read_dataset(directory):
+    # Typed, memory-mapped snapshot; fall back to the CSV export if it is not there yet
+    snapshot = os.path.join(directory, SNAPSHOT_FILE)
+    if os.path.exists(snapshot):
+        df = read_snapshot(snapshot)
+    else:
+        df = pd.read_csv(CSV_FILE, skip_blank_lines=True)
     print(df.info())  # Verifica si realmente tiene datos
-    # Normalize column names
-    df.columns = df.columns.str.strip().str.lower()
     return df
 
+# Entradas de los cachés de cada versión (función y argumentos con hash), anotadas al calcularse; al dejar
+# una versión se liberan, en lugar de esperar a que la saque la versión siguiente
+@st.cache_resource
+def version_entries():
+    return {}
+
+def remember(cached, version, *args):
+    """Record the entry ``cached(version, *args)`` computed on a cache miss (unhashed _ arguments left out)."""
+    version_entries().setdefault(version, []).append((cached, args))
+
+def evict_versions(keep):
+    """Clear the cached entries of every version not in ``keep``; reruns still holding one keep their reference."""
+    entries = version_entries()
+    for version in [version for version in list(entries) if version not in keep]:
+        for cached, args in entries.pop(version, []):
+            cached.clear(version, *args)
+
+# Load and prepare data once per snapshot version; every session gets the same (read-only) frame,
+# and a published version is loaded next to the previous one until the sessions are switched to it
+@st.cache_resource(max_entries=2)
+def load_data(version, directory):
+    remember(load_data, version, directory)
+    if SHARED_DATASET:
+        # Un solo archivo Arrow mapeado por host: los procesos comparten las páginas en lugar de tener su copia
+        df = shared_frames({'rows': os.path.join(directory, shared_path(SNAPSHOT_FILE))}, version,
+                           lambda: {'rows': prepare_dataset(read_dataset(directory))[0]})['rows']
+        return df, essential_missing(df.columns)
+    return prepare_dataset(read_dataset(directory))
+
+def read_prepared_tables(version, directory):
+    if (os.path.exists(os.path.join(directory, SNAPSHOT_FILE))
+            and all(os.path.exists(path) for path in table_paths(directory).values())):
+        return prepare_tables(read_tables(directory))
+    # Las columnas de estado de check del KPI se vuelven a añadir: split_tables solo guarda las de cada tabla
+    return prepare_tables(split_tables(load_data(version[0], directory)[0]))
+
+# Normalized case / check / individual tables for the KPIs; derived from the joined frame if not written yet
+@st.cache_resource(max_entries=2)
+def load_tables(version, directory):
+    remember(load_tables, version, directory)
+    if SHARED_DATASET:
+        paths = {name: shared_path(path) for name, path in table_paths(directory).items()}
+        return shared_frames(paths, version, lambda: read_prepared_tables(version, directory))
+    return read_prepared_tables(version, directory)
+
+# Partition manifest (min/max dates per month) of this dataset version; None without the partitioned layout
+@st.cache_data(max_entries=2)
+def load_manifest(version, directory):
+    return read_manifest(os.path.join(directory, MANIFEST_FILE))
+
+# Only the monthly partitions that overlap the selected dates (names=None: the whole snapshot)
+@st.cache_resource(max_entries=4)
+def load_rows(version, directory, names):
+    remember(load_rows, version, directory, names)
+    if names is None:
+        return load_data(version[0], directory)[0]
+    return prepare_dataset(read_partitions(names, load_manifest(version, directory),
+                                           directory=os.path.join(directory, PARTITION_DIR)))[0]
+
+# Filter index (bitmaps, sorted dates, ID positions) shared by every session for this dataset version
+@st.cache_resource(max_entries=2)
+def load_filter_index(version, _tables):
+    remember(load_filter_index, version)
+    return build_filter_index(_tables)
+
+# Check / address position of every loaded joined row, for the row mask
+@st.cache_resource(max_entries=4)
+def load_row_positions(version, names, _rows, _tables):
+    remember(load_row_positions, version, names)
+    return row_positions(_rows, _tables)
+
+# Dashboard summary from the filtered tables, per dataset version and filter selection
+@st.cache_data(max_entries=64)
+def load_table_summary(version, filters, _cases, _checks, _masks):
+    return tables_answer(_cases, _checks, _masks, filters['date_column'])
+
+# Dashboard counts per month written by the refresh job (None if not written yet), per dataset version
+@st.cache_resource(max_entries=2)
+def load_rollup(version, directory):
+    remember(load_rollup, version, directory)
+    return read_rollup(os.path.join(directory, ROLLUP_FILE))
+
+# Per-case lifecycle table written by the refresh job; derived from the cases table if not written yet
+@st.cache_resource(max_entries=2)
+def load_lifecycle(version, directory, _tables):
+    remember(load_lifecycle, version, directory)
+    lifecycle = read_lifecycle(os.path.join(directory, LIFECYCLE_FILE))
+    return case_lifecycle(_tables['cases']) if lifecycle is None else lifecycle
+
+# Advanced Stats metrics for every agent and the Horatio team, per dataset version and day
+@st.cache_resource(max_entries=2)
+def load_agent_stats(version, today, _df, _lifecycle, _tables):
+    remember(load_agent_stats, version, today)
+    return compute_agent_stats(_df, _lifecycle, _tables['checks'], today)
+
+# KYC tag flags, filter codes and created_at order, per dataset version and loaded partitions
+@st.cache_resource(max_entries=4)
+def load_kyc_index(version, names, _df):
+    remember(load_kyc_index, version, names)
+    return build_kyc_index(_df)
+
+# Embedded SQL store (DASHBOARD_BACKEND=duckdb): loaded once per dataset version, its cursor pool shared by every session
+@st.cache_resource(max_entries=2)
+def load_store(version, directory):
+    remember(load_store, version, directory)
+    sql_backend.build_store(version, directory=directory)
+    return sql_backend.open_store(directory)
+
+# Dashboard summary from the SQL store, per dataset version and filter selection
+@st.cache_data(max_entries=64)
+def load_sql_summary(version, filters, _store):
+    return sql_backend.dashboard_summary(_store, filters)
+
+def warm_version(version):
+    """Load what the pages use at a newly published version, in the watcher thread, before sessions
+    are switched to it (the same cache keys as a rerun of the published layout).
+
+    With the SQL store only the store is built: the in-memory frames of Advanced Stats are loaded
+    when that page is opened.
+    """
+    directory = version_path(version)
+    key = (version,)
+    load_manifest(key, directory)
+    if sql_backend.sql_enabled(directory):
+        load_store(key, directory)
+        return
+    df = load_data(version, directory)[0]
+    tables = load_tables(key, directory)
+    load_rollup(key, directory)
+    lifecycle = load_lifecycle(key, directory, tables)
+    load_agent_stats(key, pd.to_datetime(date.today()), df, lifecycle, tables)
+    load_filter_index(key, tables)
+    rows = load_rows(key, directory, None)
+    load_row_positions(key, None, rows, tables)
+    load_kyc_index(key, None, rows)
+
+# Background watcher of snapshots/CURRENT, one per process; reruns only read the version it settled on
+@st.cache_resource
+def snapshot_watcher():
+    return start_watcher(warm_version, lambda version: evict_versions({version, (version,)}))
+
+# Actualización programada en segundo plano (DASHBOARD_REFRESH_INTERVAL > 0), una por proceso: al publicar
+# despierta al watcher, que precarga la versión nueva antes de pasar las sesiones a ella
+@st.cache_resource
+def refresh_service(_watcher):
+    return start_refresh_service(on_publish=lambda version: _watcher['wake'].set())
+
+watcher = snapshot_watcher()
+refresh_status = refresh_service(watcher) if REFRESH_INTERVAL > 0 else None
+if watcher['version'] is not None:
+    # Versión inmutable publicada por update_data.py: su ID basta como clave de todos los cachés
+    data_version = watcher['version']
+    data_dir = version_path(data_version)
+    tables_version = rows_version = lifecycle_version = rollup_version = (data_version,)
+    version_info = read_version_manifest(data_version) or {}
+    last_update = (to_local_time(datetime.fromisoformat(version_info['created_at']))
+                   if 'created_at' in version_info else get_last_update_time(os.path.join(data_dir, SNAPSHOT_FILE)))
+    last_update += f" (version {data_version}, {version_info.get('row_counts', {}).get('rows', 0):,} rows)"
+else:
+    # Layout plano anterior: versión = tamaño + mtime de cada archivo
+    data_dir = "."
+    data_file = SNAPSHOT_FILE if os.path.exists(SNAPSHOT_FILE) else CSV_FILE
+    data_version = snapshot_version(data_file)
+    tables_version = (data_version,) + tuple(snapshot_version(path) for path in TABLE_FILES.values())
+    lifecycle_version = tables_version + (snapshot_version(LIFECYCLE_FILE),)
+    rows_version = tables_version + (snapshot_version(MANIFEST_FILE),)
+    rollup_version = tables_version + (snapshot_version(ROLLUP_FILE),)
+    evict_versions({data_version, tables_version, lifecycle_version, rows_version, rollup_version})
+    last_update = get_last_update_time(data_file)
+lap(trace, "load.version")
+
 # Navigation button
 page = st.sidebar.radio("Go to", ["Dashboard", "KYC Process Dashboard", "Advanced Stats"])
 
 # Load dataset
-df = load_data()
-
-# Verify essential columns
-if 'created_at' in df.columns:
-    df['created_at'] = pd.to_datetime(df['created_at'], errors='coerce').dt.tz_localize(None)
-else:
-    st.error(":warning: The column 'created_at' is missing in the dataset.")
-    
-if 'last_activity_cases' in df.columns:
-    df['last_activity_cases'] = pd.to_datetime(df['last_activity_cases'], errors='coerce').dt.tz_localize(None)
+manifest = load_manifest(rows_version, data_dir)
+store = load_store(tables_version, data_dir) if sql_backend.sql_enabled(data_dir) else None
+if store is not None and page != "Advanced Stats":
+    # Dashboard y KYC consultan el store: el dataset no se carga en memoria
+    missing_columns = sql_backend.missing_columns(store)
 else:
-    st.error(":warning: The column 'last_activity_cases' is missing in the dataset.")
+    if manifest is None or page == "Advanced Stats":
+        df, missing_columns = load_data(data_version, data_dir)
+    else:
+        # Dashboard y KYC leen solo las particiones mensuales que tocan las fechas elegidas
+        missing_columns = essential_missing(manifest['columns'])
+    tables = load_tables(tables_version, data_dir)
+    cases, checks, individuals = tables['cases'], tables['checks'], tables['individuals']
+lap(trace, "load.dataset")
 
-if 'assignee_name' in df.columns:
-    df['assignee_name'] = df['assignee_name'].fillna('Un-assignee')
-else:
-    st.error(":warning: The column 'assignee_name' is missing in the dataset.")
-    
-if 'check_status' in df.columns:
-    df['check_status_original'] = df['check_status']
-    df['check_status_kpi'] = df['check_status'].replace(['in_progress', 'processing', 'need_review'], 'pending')
-else:
-    st.error(":warning: The column 'check_status' is missing in the dataset.")
+def partitions_for(column, start=None, end=None):
+    """Monthly partitions overlapping [start, end) on ``column``; None (the whole snapshot) when all of them do.
+
+    With the shared dataset the whole mapped frame is always used: the filters pick rows by
+    position on it, where reading partitions would build a private copy in every process.
+    """
+    if manifest is None or SHARED_DATASET:
+        return None
+    names = overlapping_partitions(manifest, column, start, end)
+    return None if len(names) == len(manifest['partitions']) else tuple(names)
+
+# Verify essential columns
+for column in missing_columns:
+    st.error(f":warning: The column '{column}' is missing in the dataset.")
 
 # :bar_chart: **Dashboard**
 if page == "Dashboard":
     st.title(":bar_chart: Case Dashboard")
     st.markdown("### :pushpin: Overview of Cases and Checks")
     
+    if store is None:
+        filter_index = load_filter_index(tables_version, tables)
+    lap(trace, "dashboard.filter_index")
+
+    # Opciones de los filtros: del índice en memoria o del store SQL
+    def options(table, column):
+        if store is None:
+            return distinct_values(filter_index, table, column)
+        return sql_backend.distinct_values(store, table, column)
+
+    def has_column(table, column):
+        return column in (filter_index[table] if store is None else store['columns'][table])
+
     # :pushpin: **Sidebar - Filters**
     with st.sidebar.expander(":dart: Case Filters", expanded=False):
-        case_status_filter = st.multiselect("Filter by Case Status", df['cases_status'].unique(), default=df['cases_status'].unique())
-        assignee_filter = st.multiselect("Filter by Assignee", df['assignee_name'].unique(), default=df['assignee_name'].unique())
+        case_status_options = options('cases', 'cases_status')
+        assignee_options = options('cases', 'assignee_name')
+        case_status_filter = st.multiselect("Filter by Case Status", case_status_options, default=case_status_options)
+        assignee_filter = st.multiselect("Filter by Assignee", assignee_options, default=assignee_options)
     
     with st.sidebar.expander(":hammer_and_wrench: Check Filters", expanded=False):
-        check_status_filter = st.multiselect("Filter by Check Status", df['check_status_original'].unique(), default=df['check_status_original'].unique())
-        check_type_filter = st.multiselect("Filter by Check Type", df['check_type'].unique(), default=df['check_type'].unique())
+        check_status_options = options('checks', 'check_status_original')
+        check_type_options = options('checks', 'check_type')
+        check_status_filter = st.multiselect("Filter by Check Status", check_status_options, default=check_status_options)
+        check_type_filter = st.multiselect("Filter by Check Type", check_type_options, default=check_type_options)
     
     with st.sidebar.expander(":earth_africa: Additional Filters", expanded=False):
         # Filter for Date Selection
@@ -83,19 +298,21 @@ if page == "Dashboard":
         )
         
         # Filter dates based on choice
-        if date_filter_choice == "Created At":
-            start_date = st.date_input(":date: Start Date", df['created_at'].min())
-            end_date = st.date_input(":date: End Date", df['created_at'].max())
+        date_column = date_filter_choice.lower().replace(" ", "_")
+        if store is None:
+            min_date, max_date = date_bounds(filter_index['dates'][date_column])
         else:
-            start_date = st.date_input(":date: Start Date", df['last_activity_cases'].min())
-            end_date = st.date_input(":date: End Date", df['last_activity_cases'].max())
+            min_date, max_date = sql_backend.date_bounds(store, date_column)
+        start_date = st.date_input(":date: Start Date", min_date)
+        end_date = st.date_input(":date: End Date", max_date)
         
         start_date = pd.to_datetime(start_date).normalize()
-        end_date = pd.to_datetime(end_date).normalize()
+        # The end date is inclusive: keep everything before the following midnight
+        end_date = pd.to_datetime(end_date).normalize() + pd.Timedelta(days=1)
 
         # Additional filters for Country, PEP, Risk Level, etc.
-        if 'country' in df.columns:
-            country_list = df['country'].dropna().unique()
+        if has_column('individuals', 'country'):
+            country_list = options('individuals', 'country')
             selected_country = st.text_input(":mag: Search Country", "").strip()
             country_filter = [c for c in country_list if selected_country.lower() in c.lower()] if selected_country else country_list
         else:
@@ -103,67 +320,80 @@ if page == "Dashboard":
             country_filter = []
         
         pep_filter = st.selectbox(":shield: Filter by PEP", ["All", "Yes", "No"])
-        if 'risk_level' in df.columns:
-            risk_level_filter = st.multiselect(":warning: Filter by Risk Level", df['risk_level'].dropna().unique(), default=df['risk_level'].dropna().unique())
+        if has_column('cases', 'risk_level'):
+            risk_level_options = options('cases', 'risk_level')
+            risk_level_filter = st.multiselect(":warning: Filter by Risk Level", risk_level_options, default=risk_level_options)
         else:
             st.warning(":warning: The column 'risk_level' is missing in the dataset.")
             risk_level_filter = []
+    lap(trace, "dashboard.widgets")
 
-    # Apply filters based on the selected date choice
-    if date_filter_choice == "Created At":
-        df_filtered = df[
-            df['cases_status'].isin(case_status_filter) &
-            df['check_status_original'].isin(check_status_filter) &
-            df['assignee_name'].isin(assignee_filter) &
-            df['check_type'].isin(check_type_filter) &
-            df['country'].isin(country_filter) &
-            df['risk_level'].isin(risk_level_filter) &
-            (df['created_at'] >= start_date) &
-            (df['created_at'] <= end_date)
-        ]
+    # Masks for the cases table, the checks table and the joined rows, from the filter index (or SQL)
+    filters = {
+        'cases_status': case_status_filter,
+        'assignee_name': assignee_filter,
+        'risk_level': risk_level_filter,
+        'check_status_original': check_status_filter,
+        'check_type': check_type_filter,
+        'country': list(country_filter),
+        'is_pep': {"Yes": True, "No": False}.get(pep_filter),
+        'date_column': date_column,
+        'start': start_date,
+        'end': end_date,
+    }
+    if store is not None:
+        # Con el store SQL solo se traen los agregados y la página visible de filas
+        summary = load_sql_summary(tables_version, filters, store)
+        lap(trace, "dashboard.summary")
+        ctes, row_where, row_params = sql_backend.dashboard_filter(store, filters)
+        rows = sql_backend.row_source(store, ctes, row_where, row_params)
+        export_data = lambda: sql_backend.export_chunks(store, ctes, row_where, row_params)
+        lap(trace, "dashboard.filter")
     else:
-        df_filtered = df[
-            df['cases_status'].isin(case_status_filter) &
-            df['check_status_original'].isin(check_status_filter) &
-            df['assignee_name'].isin(assignee_filter) &
-            df['check_type'].isin(check_type_filter) &
-            df['country'].isin(country_filter) &
-            df['risk_level'].isin(risk_level_filter) &
-            (df['last_activity_cases'] >= start_date) &
-            (df['last_activity_cases'] <= end_date)
-        ]
-
-    if pep_filter == "Yes":
-        df_filtered = df_filtered[df_filtered['is_pep'] == True]
-    elif pep_filter == "No":
-        df_filtered = df_filtered[df_filtered['is_pep'] == False]
-    
+        masks = filter_masks(filter_index, filters)
+        names = partitions_for(date_column, start_date, end_date)
+        rows_frame = load_rows(rows_version, data_dir, names)
+        # Las filas filtradas quedan como posiciones sobre el frame compartido; no se copian
+        positions = np.flatnonzero(rows_mask(masks, load_row_positions(rows_version, names, rows_frame, tables)))
+        lap(trace, "dashboard.filter")
+
+        # KPIs, monthly series and assignee tables: from the refresh-time rollup when the selection
+        # covers whole months with every check status, type and country; else row counts over the tables
+        summary = rollup_answer(load_rollup(rollup_version, data_dir), filter_index, filters)
+        if summary is None:
+            summary = load_table_summary(tables_version, filters, cases, checks, masks)
+        rows = frame_source(rows_frame, positions)
+        export_data = lambda: iter_chunks(rows_frame, positions)
+        lap(trace, "dashboard.summary")
+
     # :bar_chart: **Case KPIs**
+    case_counts = summary['case_counts']
     col1, col2, col3, col4 = st.columns(4)
     with col1:
-        st.metric(label=":large_yellow_circle: Open Cases", value=df_filtered[df_filtered['cases_status'] == 'open']['case_id'].nunique())
+        st.metric(label=":large_yellow_circle: Open Cases", value=int(case_counts.get('open', 0)))
     with col2:
-        st.metric(label=":large_green_circle: Approved Cases", value=df_filtered[df_filtered['cases_status'] == 'approved']['case_id'].nunique())
+        st.metric(label=":large_green_circle: Approved Cases", value=int(case_counts.get('approved', 0)))
     with col3:
-        st.metric(label=":red_circle: Rejected Cases", value=df_filtered[df_filtered['cases_status'] == 'rejected']['case_id'].nunique())
+        st.metric(label=":red_circle: Rejected Cases", value=int(case_counts.get('rejected', 0)))
     with col4:
-        st.metric(label=":black_circle: Total Cases", value=df_filtered['case_id'].nunique())
+        st.metric(label=":black_circle: Total Cases", value=summary['total_cases'])
     
     # :bar_chart: **Check KPIs**
+    check_counts = summary['check_counts']
     col5, col6, col7, col8 = st.columns(4)
     with col5:
-        st.metric(label=":large_yellow_circle: Pending Checks", value=df_filtered[df_filtered['check_status_kpi'] == 'pending']['check_id'].nunique())
+        st.metric(label=":large_yellow_circle: Pending Checks", value=int(check_counts.get('pending', 0)))
     with col6:
-        st.metric(label=":large_green_circle: Approved Checks", value=df_filtered[df_filtered['check_status_kpi'] == 'approved']['check_id'].nunique())
+        st.metric(label=":large_green_circle: Approved Checks", value=int(check_counts.get('approved', 0)))
     with col7:
-        st.metric(label=":red_circle: Rejected Checks", value=df_filtered[df_filtered['check_status_kpi'] == 'rejected']['check_id'].nunique())
+        st.metric(label=":red_circle: Rejected Checks", value=int(check_counts.get('rejected', 0)))
     with col8:
-        st.metric(label=":black_circle: Total Checks", value=df_filtered['check_id'].nunique())
+        st.metric(label=":black_circle: Total Checks", value=summary['total_checks'])
+    lap(trace, "dashboard.kpis")
     
     # :bar_chart: **Charts**
-    df_filtered['Month'] = df_filtered[date_filter_choice.lower().replace(" ", "_")].dt.to_period('M').astype(str)
-    df_monthly_cases = df_filtered.groupby(['Month', 'assignee_name'])['case_id'].nunique().reset_index(name='Case Count')
-    df_monthly_checks = df_filtered.groupby(['Month', 'assignee_name'])['check_id'].nunique().reset_index(name='Check Count')
+    df_monthly_cases = summary['monthly_cases']
+    df_monthly_checks = summary['monthly_checks']
     
     if not df_monthly_cases.empty:
         st.markdown("### :date: Monthly Case Distribution")
@@ -172,22 +402,28 @@ if page == "Dashboard":
     if not df_monthly_checks.empty:
         st.markdown("### :date: Monthly Check Distribution")
         st.bar_chart(df_monthly_checks.pivot(index="Month", columns="assignee_name", values="Check Count").fillna(0))
+    lap(trace, "dashboard.charts")
 
     # :clipboard: **Tables**
     col_left, col_right = st.columns(2)
     with col_left:
         st.markdown("### :label: Cases by Assignee and Status")
-        st.dataframe(df_filtered.groupby(['assignee_name', 'cases_status'])['case_id'].nunique().unstack(fill_value=0))
+        st.dataframe(summary['cases_by_status'].unstack(fill_value=0))
     with col_right:
         st.markdown("### :white_check_mark: Checks by Assignee and Status")
-        st.dataframe(df_filtered.groupby(['assignee_name', 'check_status_original'])['check_id'].nunique().unstack(fill_value=0))
+        st.dataframe(summary['checks_by_status'].unstack(fill_value=0))
+    lap(trace, "dashboard.tables")
     
     # :open_file_folder: **Filtered Dataset Table**
     st.markdown("### :open_file_folder: Filtered Dataset")
-    st.dataframe(df_filtered)
+    paginated_table(rows, key="dashboard_rows")
+    lap(trace, "dashboard.rows_table")
 
     # :inbox_tray: **Download Data**
-    st.download_button(":inbox_tray: Download Filtered Data", df_filtered.to_csv(index=False).encode('utf-8'), "filtered_data.csv", "text/csv")
+    # El archivo se genera solo al hacer clic; misma versión y mismos filtros reutilizan la exportación
+    export_buttons(export_data, (tables_version, 'dashboard', repr(filters)),
+                   ":inbox_tray: Download Filtered Data", key="dashboard_export")
+    lap(trace, "dashboard.export_buttons")
     st.markdown("---")
     st.info(f":date: **Last Updated:** {last_update}")
 
@@ -195,25 +431,27 @@ if page == "Dashboard":
 elif page == "Advanced Stats":
     st.title(":bar_chart: Advanced Stats - Agent Tracking")
     st.markdown("### Select an agent to view advanced statistics and compare with Horatio team averages")
+
+    if 'created_at' not in df.columns:
+        st.error("Missing 'created_at' column for agent data.")
+        st.stop()
+
+    # Every agent's and the team's metrics, computed once per dataset version (and day, for aging)
+    today = pd.to_datetime(date.today())
+    lifecycle = load_lifecycle(lifecycle_version, data_dir, tables)
+    stats = load_agent_stats(lifecycle_version, today, df, lifecycle, tables)
+    lap(trace, "advanced.stats")
     
     # Agent selection
-    agent_list = sorted(df['assignee_name'].dropna().unique())
+    agent_list = sorted(stats['agent_rows'])
     selected_agent = st.selectbox("Select an agent", agent_list)
-    df_agent = df[df['assignee_name'] == selected_agent].copy()
-    
-    # Ensure 'created_at' is in datetime format
-    if 'created_at' in df_agent.columns:
-        df_agent['created_at'] = pd.to_datetime(df_agent['created_at'], errors='coerce')
-        df_agent['Month'] = df_agent['created_at'].dt.to_period('M').astype(str)
-    else:
-        st.error("Missing 'created_at' column for agent data.")
-        st.stop()
+    agent_positions = agent_rows(stats, selected_agent)
     
     # General Metrics for the selected agent
-    total_cases = df_agent['case_id'].nunique()
-    approved_cases = df_agent[df_agent['cases_status'] == 'approved']['case_id'].nunique()
-    rejected_cases = df_agent[df_agent['cases_status'] == 'rejected']['case_id'].nunique()
-    open_cases = df_agent[df_agent['cases_status'] == 'open']['case_id'].nunique()
+    agent_summary = lookup(stats['summary'], 'agent', selected_agent)
+    horatio_summary = lookup(stats['summary'], 'team', TEAM_GROUP)
+    total_cases, approved_cases, rejected_cases, open_cases = (
+        int(agent_summary[col].sum()) for col in ['total_cases', 'approved_cases', 'rejected_cases', 'open_cases'])
     
     st.subheader("General Metrics")
     col1, col2, col3, col4 = st.columns(4)
@@ -222,58 +460,31 @@ elif page == "Advanced Stats":
     col3.metric("Rejected Cases", rejected_cases)
     col4.metric("Open Cases", open_cases)
     
-    if (approved_cases + rejected_cases) > 0:
-        agent_win_ratio = round(approved_cases / (approved_cases + rejected_cases) * 100, 2)
-        st.write(f"**Approval Rate (Agent):** {agent_win_ratio}%")
+    # Tasa de aprobación ya calculada en el resumen (vacía si no hay casos aprobados ni rechazados)
+    agent_rate = agent_summary['approval_rate'].dropna()
+    if not agent_rate.empty:
+        st.write(f"**Approval Rate (Agent):** {round(float(agent_rate.iloc[0]) * 100, 2)}%")
     else:
         st.write("Not enough data to calculate the agent's approval rate.")
     
     # Horatio team data
-    df_horatio = df[df['assignee_email'].str.endswith("@hirehoratio.co", na=False)].copy()
-    horatio_approved = df_horatio[df_horatio['cases_status'] == 'approved']['case_id'].nunique()
-    horatio_rejected = df_horatio[df_horatio['cases_status'] == 'rejected']['case_id'].nunique()
-    
-    if (horatio_approved + horatio_rejected) > 0:
-        horatio_win_ratio = round(horatio_approved / (horatio_approved + horatio_rejected) * 100, 2)
-        st.write(f"**Approval Rate (Horatio Team):** {horatio_win_ratio}%")
+    horatio_rate = horatio_summary['approval_rate'].dropna()
+    if not horatio_rate.empty:
+        st.write(f"**Approval Rate (Horatio Team):** {round(float(horatio_rate.iloc[0]) * 100, 2)}%")
     else:
         st.write("Not enough data to calculate the Horatio team's approval rate.")
+    lap(trace, "advanced.summary")
     
     st.markdown("---")
-    
-    # Helper functions for approval rate trends
-    def compute_approved_rate_trend_cases(data):
-        """Compute monthly approval rate trend for cases."""
-        if 'updated_at_cases' in data.columns:
-            data['Month_Cases'] = pd.to_datetime(data['updated_at_cases'], errors='coerce').dt.to_period('M').astype(str)
-        else:
-            data['Month_Cases'] = data['created_at'].dt.to_period('M').astype(str)
-        trend = data.groupby('Month_Cases').agg(
-            approved_cases=('cases_status', lambda x: (x == 'approved').sum()),
-            total_cases=('case_id', 'nunique')
-        ).reset_index()
-        trend['approved_rate'] = trend['approved_cases'] / trend['total_cases']
-        return trend
-    
-    def compute_approved_rate_trend_checks(data):
-        """Compute monthly approval rate trend for checks."""
-        if 'updated_at_checks' in data.columns:
-            data['Month_Checks'] = pd.to_datetime(data['updated_at_checks'], errors='coerce').dt.to_period('M').astype(str)
-        else:
-            data['Month_Checks'] = data['created_at'].dt.to_period('M').astype(str)
-        trend = data.groupby('Month_Checks').agg(
-            approved_checks=('check_status', lambda x: (x == 'approved').sum()),
-            total_checks=('check_id', 'nunique')
-        ).reset_index()
-        trend['approved_rate'] = trend['approved_checks'] / trend['total_checks']
-        return trend
+
+    def compare_with_team(result):
+        """Selected agent's and Horatio team's rows of an engine result, labelled by Group."""
+        agent_part = lookup(stats[result], 'agent', selected_agent).assign(Group='Selected Agent')
+        team_part = lookup(stats[result], 'team', TEAM_GROUP).assign(Group='Horatio Team')
+        return agent_part, team_part
     
     # Approval rate trend for cases
-    agent_cases_trend = compute_approved_rate_trend_cases(df_agent)
-    horatio_cases_trend = compute_approved_rate_trend_cases(df_horatio)
-    agent_cases_trend['Group'] = 'Selected Agent'
-    horatio_cases_trend['Group'] = 'Horatio Team'
-    combined_cases_trend = pd.concat([agent_cases_trend, horatio_cases_trend], ignore_index=True)
+    combined_cases_trend = pd.concat(compare_with_team('case_trend'), ignore_index=True).rename(columns={'Month': 'Month_Cases'})
     
     st.subheader("Monthly Approval Rate Trend (Cases)")
     if not combined_cases_trend.empty:
@@ -291,11 +502,7 @@ elif page == "Advanced Stats":
     st.markdown("---")
     
     # Approval rate trend for checks
-    agent_checks_trend = compute_approved_rate_trend_checks(df_agent)
-    horatio_checks_trend = compute_approved_rate_trend_checks(df_horatio)
-    agent_checks_trend['Group'] = 'Selected Agent'
-    horatio_checks_trend['Group'] = 'Horatio Team'
-    combined_checks_trend = pd.concat([agent_checks_trend, horatio_checks_trend], ignore_index=True)
+    combined_checks_trend = pd.concat(compare_with_team('check_trend'), ignore_index=True).rename(columns={'Month': 'Month_Checks'})
     
     st.subheader("Monthly Approval Rate Trend (Checks)")
     if not combined_checks_trend.empty:
@@ -309,40 +516,15 @@ elif page == "Advanced Stats":
         st.altair_chart(chart_checks, use_container_width=True)
     else:
         st.info("No data available for check approval trend.")
+    lap(trace, "advanced.approval_trends")
     
     st.markdown("---")
     
     # Resolution Time Analysis
     st.subheader("Resolution Time Analysis")
-    if 'last_activity_cases' in df_agent.columns:
-        df_agent['last_activity_cases'] = pd.to_datetime(df_agent['last_activity_cases'], errors='coerce')
-        df_agent['resolution_time'] = (df_agent['last_activity_cases'] - df_agent['created_at']).dt.days
-    else:
-        st.error("Missing 'last_activity_cases' column for resolution time analysis.")
-    
-    df_agent_closed = df_agent[df_agent['cases_status'].isin(['approved', 'rejected'])].copy()
-    if not df_agent_closed.empty:
-        agent_resolution_trend = df_agent_closed.groupby('Month').agg(avg_resolution=('resolution_time', 'mean')).reset_index()
-    else:
-        agent_resolution_trend = pd.DataFrame()
-    
-    if 'last_activity_cases' in df_horatio.columns:
-        df_horatio['last_activity_cases'] = pd.to_datetime(df_horatio['last_activity_cases'], errors='coerce')
-        df_horatio['resolution_time'] = (df_horatio['last_activity_cases'] - pd.to_datetime(df_horatio['created_at'], errors='coerce')).dt.days
-    else:
-        st.error("Missing 'last_activity_cases' column for Horatio team resolution time analysis.")
-    
-    df_horatio_closed = df_horatio[df_horatio['cases_status'].isin(['approved', 'rejected'])].copy()
-    if not df_horatio_closed.empty:
-        horatio_resolution_trend = df_horatio_closed.groupby(
-            df_horatio_closed['created_at'].dt.to_period('M').astype(str)
-        ).agg(avg_resolution=('resolution_time', 'mean')).reset_index().rename(columns={'created_at': 'Month'})
-    else:
-        horatio_resolution_trend = pd.DataFrame()
+    agent_resolution_trend, horatio_resolution_trend = compare_with_team('resolution_trend')
     
     if not agent_resolution_trend.empty and not horatio_resolution_trend.empty:
-        agent_resolution_trend['Group'] = 'Selected Agent'
-        horatio_resolution_trend['Group'] = 'Horatio Team'
         combined_resolution_trend = pd.concat([agent_resolution_trend, horatio_resolution_trend], ignore_index=True)
         chart_resolution = alt.Chart(combined_resolution_trend).mark_line(point=True).encode(
             x=alt.X('Month:N', title='Month'),
@@ -358,51 +540,61 @@ elif page == "Advanced Stats":
     st.markdown("---")
     
     # Resolution Time Distribution (Box Plot)
+    # Cuartiles, bigotes y valores atípicos ya calculados: el gráfico recibe unas pocas filas por grupo
     st.subheader("Resolution Time Distribution")
-    if not df_agent_closed.empty and not df_horatio_closed.empty:
-        agent_box = df_agent_closed[['resolution_time']].copy()
-        agent_box['Group'] = 'Selected Agent'
-        horatio_box = df_horatio_closed[['resolution_time']].copy()
-        horatio_box['Group'] = 'Horatio Team'
+    agent_box, horatio_box = compare_with_team('resolution_box')
+    if not agent_box.empty and not horatio_box.empty:
         combined_box = pd.concat([agent_box, horatio_box], ignore_index=True)
-        boxplot = alt.Chart(combined_box).mark_boxplot().encode(
-            x=alt.X('Group:N', title='Group'),
-            y=alt.Y('resolution_time:Q', title='Resolution Time (days)'),
-            tooltip=[alt.Tooltip('resolution_time:Q', title='Days')]
-        ).properties(width=700, height=300, title="Distribution of Resolution Time")
+        combined_outliers = pd.concat(compare_with_team('resolution_outliers'), ignore_index=True)
+        box_base = alt.Chart(combined_box).encode(x=alt.X('Group:N', title='Group'))
+        whiskers = box_base.mark_rule().encode(
+            y=alt.Y('lower:Q', title='Resolution Time (days)'), y2='upper:Q')
+        boxes = box_base.mark_bar(size=40).encode(
+            y='q1:Q', y2='q3:Q',
+            tooltip=[alt.Tooltip(col, type='quantitative', title=title, format='.1f') for col, title in
+                     [('upper', 'Upper whisker'), ('q3', 'Q3'), ('median', 'Median'), ('q1', 'Q1'),
+                      ('lower', 'Lower whisker')]])
+        medians = box_base.mark_tick(color='white', size=40).encode(y='median:Q')
+        outliers = alt.Chart(combined_outliers).mark_point().encode(
+            x='Group:N', y='resolution_time:Q',
+            tooltip=[alt.Tooltip('resolution_time:Q', title='Days'), alt.Tooltip('cases:Q', title='Cases')])
+        boxplot = alt.layer(whiskers, boxes, medians, outliers).properties(
+            width=700, height=300, title="Distribution of Resolution Time")
         st.altair_chart(boxplot, use_container_width=True)
     else:
         st.info("Not enough data to analyze resolution time distribution.")
+    lap(trace, "advanced.resolution")
     
     st.markdown("---")
     
     # Open Cases Aging Analysis
     st.subheader("Open Cases Aging Analysis")
-    today = pd.to_datetime(date.today())
-    # Remove duplicate cases based on 'case_id' before analysis
-    df_open = df_agent[df_agent['cases_status'] == 'open'].drop_duplicates(subset=['case_id']).copy()
-    if not df_open.empty:
-        df_open['days_open'] = (today - df_open['created_at']).dt.days
+    aging_bins = lookup(stats['aging_bins'], 'agent', selected_agent)
+    if not aging_bins.empty:
         st.markdown("**Summary of Open Cases Aging (in days):**")
-        st.write(df_open['days_open'].describe().reset_index())
-        aging_chart = alt.Chart(df_open).mark_bar().encode(
-            x=alt.X('days_open:Q', bin=alt.Bin(step=10), title='Days Open'),
-            y=alt.Y('count()', title='Number of Cases'),
-            tooltip=[alt.Tooltip('count()', title='Count'),
-                     alt.Tooltip('days_open:Q', title='Days Open')]
+        st.write(lookup(stats['aging'], 'agent', selected_agent).iloc[0].rename('days_open').reset_index())
+        # Barras de AGING_BIN_DAYS días contadas en el servidor
+        aging_chart = alt.Chart(aging_bins).mark_bar().encode(
+            x=alt.X('bin_start:Q', title='Days Open'), x2='bin_end:Q',
+            y=alt.Y('cases:Q', title='Number of Cases'),
+            tooltip=[alt.Tooltip('cases:Q', title='Count'),
+                     alt.Tooltip('bin_start:Q', title='Days Open (from)'),
+                     alt.Tooltip('bin_end:Q', title='Days Open (to)')]
         ).properties(width=700, height=300, title="Distribution of Open Cases Aging")
         st.altair_chart(aging_chart, use_container_width=True)
-        oldest_cases = df_open.sort_values(by='days_open', ascending=False).head(10)
+        oldest_cases = lookup(stats['oldest_open'], 'agent', selected_agent)
         st.markdown("**Top 10 Oldest Open Cases:**")
         st.dataframe(oldest_cases[['case_id', 'created_at', 'days_open']])
     else:
         st.info("No open cases available for aging analysis.")
+    lap(trace, "advanced.aging")
     
     st.markdown("---")
   
 
     st.subheader("Selected Agent Data")
-    st.dataframe(df_agent)
+    paginated_table(frame_source(df, agent_positions), key="agent_rows")
+    lap(trace, "advanced.rows_table")
 
 elif page == "KYC Process Dashboard":
     st.title("📊 KYC Process Dashboard")
@@ -417,47 +609,54 @@ elif page == "KYC Process Dashboard":
     # Obtener la fecha actual
     today = datetime.today()
 
-    # Filtrar datos según la opción seleccionada
-    filtered_data = df.copy()
-    if date_filter == "Last 15 Days":
-        filtered_data = filtered_data[filtered_data["created_at"] >= today - timedelta(days=15)]
-    elif date_filter == "Last Month":
-        filtered_data = filtered_data[filtered_data["created_at"] >= today - timedelta(days=30)]
+    # Filtrar datos según la opción seleccionada: la ventana sale del índice ordenado por created_at (o de SQL)
+    if store is None:
+        names = partitions_for('created_at', window_start(date_filter, today))
+        kyc_rows = load_rows(rows_version, data_dir, names)
+        kyc_index = load_kyc_index(rows_version, names, kyc_rows)
+        positions = window_positions(kyc_index, date_filter, today)
+    else:
+        window_where, window_params = sql_backend.kyc_filter(date_filter, today)
+    lap(trace, "kyc.window")
+
+    def options(col):
+        if store is None:
+            return filter_options(kyc_index, col, positions)
+        return sql_backend.kyc_options(store, col, window_where, window_params)
 
     # Dropdowns para filtros adicionales
-    case_status_filter = st.sidebar.selectbox("📂 Case Status", ["All"] + list(filtered_data["cases_status"].dropna().unique()))
-    check_type_filter = st.sidebar.selectbox("✅ Check Type", ["All"] + list(filtered_data["check_type"].dropna().unique()))
-    risk_level_filter = st.sidebar.selectbox("⚠️ Risk Level", ["All"] + list(filtered_data["risk_level"].dropna().unique()))
-    country_filter = st.sidebar.selectbox("🌍 Country", ["All"] + list(filtered_data["country"].dropna().unique()))
+    case_status_filter = st.sidebar.selectbox("📂 Case Status", ["All"] + options("cases_status"))
+    check_type_filter = st.sidebar.selectbox("✅ Check Type", ["All"] + options("check_type"))
+    risk_level_filter = st.sidebar.selectbox("⚠️ Risk Level", ["All"] + options("risk_level"))
+    country_filter = st.sidebar.selectbox("🌍 Country", ["All"] + options("country"))
+    lap(trace, "kyc.widgets")
 
     # Aplicar filtros solo si no es "All"
-    if case_status_filter != "All":
-        filtered_data = filtered_data[filtered_data["cases_status"] == case_status_filter]
-    if check_type_filter != "All":
-        filtered_data = filtered_data[filtered_data["check_type"] == check_type_filter]
-    if risk_level_filter != "All":
-        filtered_data = filtered_data[filtered_data["risk_level"] == risk_level_filter]
-    if country_filter != "All":
-        filtered_data = filtered_data[filtered_data["country"] == country_filter]
-
-    total_kyc_cases = filtered_data['case_id'].nunique()
-    completed_kyc_cases = filtered_data[filtered_data['cases_status'] == 'open']['case_id'].nunique()
-    aml_alerts = filtered_data[(filtered_data['check_type'] == 'aml') & (filtered_data['check_status'] == 'need_review') & 
-                               (filtered_data['cases_status'].isin(['open', 'approved']))]['check_id'].nunique()
-    idv_alerts = filtered_data[(filtered_data['check_type'] == 'id_verification') & (filtered_data['check_status'] == 'need_review') & 
-                               (filtered_data['cases_status'] == 'open')]['check_id'].nunique()
-    
-    individual_types = {"POA Lookback (1.14.2025)", "Individual", "True Match - PEP", "Employee", "VIP_Customer"}
-    document_alerts = filtered_data[(filtered_data['check_type'].isin(['id_document', 'document'])) & 
-                                    (filtered_data['check_status'] == 'need_review') & 
-                                    (filtered_data['cases_status'] == 'open') & 
-                                    (filtered_data['entity_type'].apply(lambda x: any(ind in x for ind in individual_types)))]['check_id'].nunique()
-    document_alerts_companies = filtered_data[(filtered_data['check_type'] == 'document') & 
-                                              (filtered_data['check_status'] == 'need_review') & 
-                                              (filtered_data['cases_status'] == 'open') & 
-                                              (filtered_data['entity_type'] == 'business')]['check_id'].nunique()
-
-
+    selections = {
+        "cases_status": case_status_filter,
+        "check_type": check_type_filter,
+        "risk_level": risk_level_filter,
+        "country": country_filter,
+    }
+    if store is None:
+        positions = apply_filters(kyc_index, positions, selections)
+        kpis = kyc_kpis(kyc_index, positions)
+        rows = frame_source(kyc_rows, positions)
+        export_data = lambda: iter_chunks(kyc_rows, positions)
+        row_count = len(positions)
+    else:
+        kyc_where, kyc_params = sql_backend.kyc_filter(date_filter, today, selections)
+        kpis = sql_backend.kyc_kpis(store, kyc_where, kyc_params)
+        rows = sql_backend.row_source(store, "", kyc_where, kyc_params)
+        export_data = lambda: sql_backend.export_chunks(store, "", kyc_where, kyc_params)
+        row_count = rows['count']("")
+    lap(trace, "kyc.filter")
+    total_kyc_cases = kpis['total_kyc_cases']
+    completed_kyc_cases = kpis['completed_kyc_cases']
+    aml_alerts = kpis['aml_alerts']
+    idv_alerts = kpis['idv_alerts']
+    document_alerts = kpis['document_alerts']
+    document_alerts_companies = kpis['document_alerts_companies']
     
     col1, col2, col3 = st.columns(3)
     col4, col5, col6 = st.columns(3)
@@ -468,12 +667,35 @@ elif page == "KYC Process Dashboard":
     col4.metric("🛂 Total Number of IDV Alerts in Review", idv_alerts)
     col5.metric("📑 Total Number of Document Alerts (Individuals) in Review", document_alerts)
     col6.metric("🏢 Total Number of Document Alerts (Companies) in Review", document_alerts_companies)
+    lap(trace, "kyc.kpis")
 
     # 📋 **Datos Filtrados**
     st.markdown("### 📋 Filtered Data")
-    st.dataframe(filtered_data)
+    paginated_table(rows, key="kyc_rows")
+    lap(trace, "kyc.rows_table")
 
     # 📥 **Descargar datos filtrados**
-    st.download_button("📥 Download Filtered Data", filtered_data.to_csv(index=False).encode('utf-8'), "filtered_data.csv", "text/csv")
-
+    # La ventana solo se achica con el tiempo: mismo filtro y mismo número de filas = mismas filas
+    export_buttons(export_data, (tables_version, 'kyc', date_filter, repr(selections), row_count),
+                   "📥 Download Filtered Data", key="kyc_export")
+    lap(trace, "kyc.export_buttons")
 
+# :stopwatch: **Performance**
+PAGE_SPANS = {"Dashboard": "dashboard", "KYC Process Dashboard": "kyc", "Advanced Stats": "advanced"}
+rerun_seconds = finish_trace(trace, f"rerun.{PAGE_SPANS[page]}")
+if DEBUG_PANEL or st.query_params.get("debug") == "1":
+    # Panel opcional: desglose de esta ejecución y percentiles móviles del proceso
+    with st.sidebar.expander(":stopwatch: Performance", expanded=True):
+        st.metric("This rerun", f"{rerun_seconds * 1000:,.0f} ms")
+        st.dataframe(pd.DataFrame(trace['spans'], columns=['span', 'ms', 'rss_delta_mb', 'rss_mb'])
+                     .set_index('span').round(1))
+        rolling = pd.DataFrame([{'span': name, 'count': stats['count'],
+                                 **{f"p{round(q * 100)} ms": value * 1000 for q, value in stats['quantiles'].items()}}
+                                for name, stats in percentiles().items()])
+        st.caption("Rolling percentiles (this process)")
+        st.dataframe(rolling.set_index('span').round(1) if not rolling.empty else rolling)
+        if refresh_status is not None:
+            st.caption("Background refresh")
+            st.json({key: refresh_status[key] for key in ['running', 'runs', 'failures', 'last_success',
+                                                          'last_error', 'next_run']}, expanded=False)
+write_metrics()
@@ -0,0 +1,120 @@
+import os
+import time
+import threading
+from collections import deque
+import numpy as np
+
+# Muestras por span que entran en los percentiles móviles
+WINDOW = int(os.getenv("DASHBOARD_PROFILE_WINDOW", "500"))
+QUANTILES = [0.5, 0.9, 0.99]
+# Archivo de métricas (formato de texto de Prometheus) que se reescribe cada METRICS_INTERVAL segundos;
+# "{pid}" se reemplaza por el proceso, para que varios procesos no se pisen. Vacío: no se escribe
+METRICS_FILE = os.getenv("DASHBOARD_METRICS_FILE", "dashboard_metrics.prom")
+METRICS_INTERVAL = float(os.getenv("DASHBOARD_METRICS_INTERVAL", "10"))
+# Panel de depuración en la barra lateral para todas las sesiones (si no, solo con ?debug=1)
+DEBUG_PANEL = os.getenv("DASHBOARD_DEBUG", "0") == "1"
+
+_samples = {}
+_counts = {}
+_sums = {}
+_lock = threading.Lock()
+_last_write = [0.0]
+
+
+def rss_mb():
+    """Resident memory of this process in MB (0 where /proc is not available)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+
+def start_trace():
+    """Span list of one rerun (or one refresh run); spans are laps from the previous mark."""
+    now = time.perf_counter()
+    return {'spans': [], 'started': now, 'mark': now, 'rss': rss_mb(), 'start_rss': rss_mb()}
+
+
+def lap(trace, name):
+    """Close span ``name``: the time and RSS change since the previous lap (or the start of the trace).
+
+    Does nothing when ``trace`` is None, so instrumented helpers can run untraced.
+    """
+    if trace is None:
+        return
+    now, rss = time.perf_counter(), rss_mb()
+    seconds = now - trace['mark']
+    trace['spans'].append({'span': name, 'ms': seconds * 1000, 'rss_mb': rss, 'rss_delta_mb': rss - trace['rss']})
+    trace['mark'], trace['rss'] = now, rss
+    record(name, seconds)
+
+
+def finish_trace(trace, name):
+    """Record the whole trace as span ``name`` and return its duration in seconds."""
+    seconds = time.perf_counter() - trace['started']
+    record(name, seconds)
+    return seconds
+
+
+def record(name, seconds):
+    """Add one duration sample of span ``name`` to the process-wide rolling window."""
+    with _lock:
+        if name not in _samples:
+            _samples[name] = deque(maxlen=WINDOW)
+            _counts[name] = 0
+            _sums[name] = 0.0
+        _samples[name].append(seconds)
+        _counts[name] += 1
+        _sums[name] += seconds
+
+
+def percentiles():
+    """Rolling QUANTILES (seconds), total count and total seconds of every span recorded in this process."""
+    with _lock:
+        snapshot = {name: (np.array(samples), _counts[name], _sums[name]) for name, samples in _samples.items()}
+    return {name: {'quantiles': dict(zip(QUANTILES, np.quantile(samples, QUANTILES))), 'count': count, 'sum': total}
+            for name, (samples, count, total) in sorted(snapshot.items())}
+
+
+def metrics_text(prefix):
+    """Every span as a Prometheus summary: rolling quantiles plus lifetime _sum and _count."""
+    metric = f"{prefix}_span_seconds"
+    lines = [f"# HELP {metric} Duration of instrumented spans (rolling quantiles over the last {WINDOW} samples).",
+             f"# TYPE {metric} summary"]
+    for name, stats in percentiles().items():
+        for quantile, value in stats['quantiles'].items():
+            lines.append(f'{metric}{{span="{name}",quantile="{quantile}"}} {value:.6f}')
+        lines.append(f'{metric}_sum{{span="{name}"}} {stats["sum"]:.6f}')
+        lines.append(f'{metric}_count{{span="{name}"}} {stats["count"]}')
+    lines.append(f"# TYPE {prefix}_rss_bytes gauge")
+    lines.append(f"{prefix}_rss_bytes {rss_mb() * 1e6:.0f}")
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics(path=METRICS_FILE, prefix="dashboard", force=False):
+    """Rewrite the metrics file at most every METRICS_INTERVAL seconds (always with ``force``).
+
+    The file is replaced in one step, so a scraper never reads it half written.
+    """
+    if not path:
+        return
+    now = time.monotonic()
+    with _lock:
+        if not force and now - _last_write[0] < METRICS_INTERVAL:
+            return
+        _last_write[0] = now
+    path = path.replace("{pid}", str(os.getpid()))
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        f.write(metrics_text(prefix))
+    os.replace(tmp, path)
+
+
+def format_trace(trace):
+    """Text breakdown of a trace, one span per line (for the refresh job's log)."""
+    lines = [f"   {span['span']:<24} {span['ms']:>10,.1f} ms {span['rss_delta_mb']:>+9,.1f} MB"
+             for span in trace['spans']]
+    total = (time.perf_counter() - trace['started']) * 1000
+    lines.append(f"   {'total':<24} {total:>10,.1f} ms {rss_mb() - trace['start_rss']:>+9,.1f} MB")
+    return "\n".join(lines)
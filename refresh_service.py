@@ -0,0 +1,93 @@
+import os
+import sys
+import time
+import random
+import threading
+import subprocess
+from datetime import datetime, timedelta, timezone
+from snapshots import SNAPSHOT_ROOT, current_version, read_version_manifest
+from profiling import record
+
+# Actualización programada dentro del proceso del dashboard: segundos entre versiones (0 = desactivada)
+REFRESH_INTERVAL = int(os.getenv("DASHBOARD_REFRESH_INTERVAL", "0"))
+# Variación aleatoria de cada espera (fracción), para que varias réplicas no consulten la base a la vez
+REFRESH_JITTER = float(os.getenv("DASHBOARD_REFRESH_JITTER", "0.1"))
+# Primer reintento tras un fallo (segundos); se duplica con cada fallo seguido, hasta el intervalo
+REFRESH_RETRY_DELAY = int(os.getenv("DASHBOARD_REFRESH_RETRY_DELAY", "60"))
+# Duración máxima de una corrida (segundos); pasado ese tiempo se aborta y cuenta como fallo
+REFRESH_TIMEOUT = int(os.getenv("DASHBOARD_REFRESH_TIMEOUT", "3600"))
+
+UPDATE_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "update_data.py")
+
+
+def run_update_script(timeout=REFRESH_TIMEOUT):
+    """Run update_data.py in a child process: the extraction's memory is returned to the OS when it exits."""
+    subprocess.run([sys.executable, UPDATE_SCRIPT], check=True, timeout=timeout)
+
+
+def version_age(root=SNAPSHOT_ROOT):
+    """Seconds since the published version was built; None when there is none yet."""
+    version = current_version(root)
+    manifest = read_version_manifest(version, root) if version else None
+    if not manifest or 'created_at' not in manifest:
+        return None
+    return (datetime.now(timezone.utc) - datetime.fromisoformat(manifest['created_at'])).total_seconds()
+
+
+def retry_delay(failures, interval, first=REFRESH_RETRY_DELAY):
+    """Exponential backoff after ``failures`` failed runs in a row, never longer than the interval."""
+    return min(first * 2 ** (failures - 1), interval)
+
+
+def start_refresh_service(refresh=run_update_script, on_publish=None, interval=REFRESH_INTERVAL,
+                          jitter=REFRESH_JITTER, first_retry=REFRESH_RETRY_DELAY, root=SNAPSHOT_ROOT):
+    """Run ``refresh`` in a daemon thread whenever the published version is ``interval`` seconds old.
+
+    A version published by someone else (another replica, the cron job) postpones the next run.
+    Failed runs are retried with exponential backoff while the dashboard keeps serving the current
+    version. After a run moves CURRENT, ``on_publish(version)`` is called (to wake the snapshot
+    watcher). Returns a dict with the service's status, updated in place; setting its 'stop' event
+    ends the thread at its next wait.
+    """
+    status = {'running': False, 'runs': 0, 'failures': 0, 'last_success': None, 'last_error': None,
+              'next_run': None, 'stop': threading.Event()}
+
+    def wait(seconds):
+        status['next_run'] = (datetime.now(timezone.utc) + timedelta(seconds=seconds)).isoformat()
+        status['stop'].wait(seconds)
+
+    def loop():
+        wait(random.uniform(0, jitter * interval))
+        while not status['stop'].is_set():
+            age = version_age(root)
+            if status['failures'] == 0 and age is not None and age < interval:
+                wait((interval - age) * random.uniform(1, 1 + jitter))
+                continue
+            before = current_version(root)
+            status['running'] = True
+            started = time.perf_counter()
+            pause = 0
+            try:
+                refresh()
+                status['failures'], status['last_error'] = 0, None
+                status['last_success'] = datetime.now(timezone.utc).isoformat()
+                latest = current_version(root)
+                if latest is not None and latest != before:
+                    if on_publish is not None:
+                        on_publish(latest)
+                else:
+                    # Nada publicado (otra actualización tenía el lock): volver a mirar más tarde
+                    pause = first_retry
+            except Exception as error:  # el dashboard sigue con la versión publicada
+                status['failures'] += 1
+                status['last_error'] = repr(error)
+                pause = retry_delay(status['failures'], interval, first_retry)
+            finally:
+                status['running'] = False
+                status['runs'] += 1
+                record("refresh.run", time.perf_counter() - started)
+            if pause:
+                wait(pause * random.uniform(1, 1 + jitter))
+
+    threading.Thread(target=loop, name="refresh-service", daemon=True).start()
+    return status
@@ -0,0 +1,198 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import socket
+import threading
+from datetime import datetime, timezone
+
+try:
+    import fcntl
+except ImportError:  # Windows: el lock solo excluye dentro del proceso
+    fcntl = None
+
+# Versiones inmutables del dataset: snapshots/<versión>/ y un puntero snapshots/CURRENT a la publicada
+SNAPSHOT_ROOT = os.getenv("SNAPSHOT_ROOT", "snapshots")
+CURRENT_FILE = "CURRENT"
+VERSION_MANIFEST = "version.json"
+LEASE_DIR = ".leases"
+STAGING_PREFIX = ".staging-"
+# Lock de la actualización: una sola construcción de versión a la vez por directorio de snapshots
+REFRESH_LOCK = ".refresh.lock"
+# Versiones que se conservan además de la actual
+KEEP_VERSIONS = int(os.getenv("SNAPSHOT_KEEP_VERSIONS", "2"))
+# Un lector que no renueva su lease en este tiempo (segundos) ya no retiene su versión
+LEASE_TTL = int(os.getenv("SNAPSHOT_LEASE_TTL", "900"))
+# Cada cuánto revisan los dashboards el puntero (segundos)
+WATCH_INTERVAL = int(os.getenv("SNAPSHOT_WATCH_INTERVAL", "30"))
+
+
+def version_path(version, root=SNAPSHOT_ROOT):
+    return os.path.join(root, version)
+
+
+def current_version(root=SNAPSHOT_ROOT):
+    """The published version, or None when nothing has been published (flat layout)."""
+    try:
+        with open(os.path.join(root, CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def read_version_manifest(version, root=SNAPSHOT_ROOT):
+    path = os.path.join(version_path(version, root), VERSION_MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def list_versions(root=SNAPSHOT_ROOT):
+    """Published version directories, oldest first (IDs start with their UTC build time)."""
+    if not os.path.isdir(root):
+        return []
+    return sorted(name for name in os.listdir(root)
+                  if not name.startswith('.') and os.path.isdir(os.path.join(root, name)))
+
+
+def new_version_id():
+    return datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ") + "-" + uuid.uuid4().hex[:6]
+
+
+def staging_dir(root=SNAPSHOT_ROOT):
+    """A fresh directory to build the next version in; invisible to readers until published."""
+    path = os.path.join(root, STAGING_PREFIX + uuid.uuid4().hex)
+    os.makedirs(path)
+    return path
+
+
+def publish(staging, manifest, root=SNAPSHOT_ROOT):
+    """Turn a staging directory into an immutable version and point CURRENT at it.
+
+    Both steps are renames, so a reader sees either the old version or the complete new one.
+    Returns the version ID.
+    """
+    version = manifest['version']
+    with open(os.path.join(staging, VERSION_MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.rename(staging, version_path(version, root))
+    pointer = os.path.join(root, CURRENT_FILE)
+    with open(pointer + ".tmp", "w") as f:
+        f.write(version + "\n")
+    os.replace(pointer + ".tmp", pointer)
+    return version
+
+
+def acquire_refresh_lock(root=SNAPSHOT_ROOT):
+    """Take the refresh lock without waiting: the open lock file, or None if another refresh holds it.
+
+    The lock is an flock on a file under ``root``, so it is released if the holder dies.
+    """
+    os.makedirs(root, exist_ok=True)
+    handle = open(os.path.join(root, REFRESH_LOCK), "a")
+    if fcntl is not None:
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return None
+    return handle
+
+
+def release_refresh_lock(handle):
+    if fcntl is not None:
+        fcntl.flock(handle, fcntl.LOCK_UN)
+    handle.close()
+
+
+def link_or_copy(source, target):
+    """Share an unchanged immutable file with the previous version (hard link), or copy it."""
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+
+def lease_path(version, root=SNAPSHOT_ROOT):
+    return os.path.join(version_path(version, root), LEASE_DIR, f"{socket.gethostname()}-{os.getpid()}")
+
+
+def renew_lease(version, root=SNAPSHOT_ROOT):
+    """Record that this process still reads ``version``, so garbage collection keeps it."""
+    path = lease_path(version, root)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(str(time.time()))
+
+
+def release_lease(version, root=SNAPSHOT_ROOT):
+    try:
+        os.remove(lease_path(version, root))
+    except FileNotFoundError:
+        pass
+
+
+def has_live_lease(version, root=SNAPSHOT_ROOT, ttl=LEASE_TTL):
+    leases = os.path.join(version_path(version, root), LEASE_DIR)
+    if not os.path.isdir(leases):
+        return False
+    now = time.time()
+    return any(now - os.path.getmtime(os.path.join(leases, name)) < ttl for name in os.listdir(leases))
+
+
+def collect_garbage(root=SNAPSHOT_ROOT, keep=KEEP_VERSIONS, ttl=LEASE_TTL):
+    """Delete versions older than the newest ``keep`` that no reader holds, plus abandoned staging dirs.
+
+    The current version is never deleted. Returns the deleted version IDs.
+    """
+    current = current_version(root)
+    versions = list_versions(root)
+    deleted = []
+    for version in versions[:max(len(versions) - keep - 1, 0)]:
+        if version != current and not has_live_lease(version, root, ttl):
+            shutil.rmtree(version_path(version, root), ignore_errors=True)
+            deleted.append(version)
+    if os.path.isdir(root):
+        for name in os.listdir(root):
+            path = os.path.join(root, name)
+            if name.startswith(STAGING_PREFIX) and time.time() - os.path.getmtime(path) > ttl:
+                shutil.rmtree(path, ignore_errors=True)
+    return deleted
+
+
+def start_watcher(on_change, on_switch=None, root=SNAPSHOT_ROOT, interval=WATCH_INTERVAL):
+    """Poll CURRENT in a daemon thread and return a dict whose 'version' follows it.
+
+    When the pointer moves, ``on_change(version)`` runs first (to load the new version in the
+    background) and only then is 'version' switched, so reruns never wait for the load; after the
+    switch, ``on_switch(version)`` runs (to free what only the previous version used). The
+    thread also renews this process's lease on the version in use; setting 'wake' makes it
+    check right away instead of at the next interval.
+    """
+    watcher = {'version': current_version(root), 'error': None, 'wake': threading.Event()}
+
+    def loop():
+        while True:
+            watcher['wake'].wait(interval)
+            watcher['wake'].clear()
+            try:
+                latest = current_version(root)
+                if latest is not None and latest != watcher['version']:
+                    on_change(latest)
+                    previous, watcher['version'] = watcher['version'], latest
+                    if on_switch is not None:
+                        on_switch(latest)
+                    if previous is not None:
+                        release_lease(previous, root)
+                if watcher['version'] is not None:
+                    renew_lease(watcher['version'], root)
+                watcher['error'] = None
+            except Exception as error:  # el dashboard sigue con la versión anterior
+                watcher['error'] = repr(error)
+
+    if watcher['version'] is not None:
+        renew_lease(watcher['version'], root)
+    threading.Thread(target=loop, name="snapshot-watcher", daemon=True).start()
+    return watcher
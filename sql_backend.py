@@ -0,0 +1,307 @@
+import os
+import queue
+from contextlib import contextmanager
+import pandas as pd
+import pyarrow.parquet as pq
+from data_store import SNAPSHOT_FILE, DATE_COLUMNS, PENDING_CHECK_STATUSES, table_paths
+from exports import EXPORT_CHUNK_ROWS
+from kyc_metrics import window_start, parse_tags, is_individual, is_business
+
+try:
+    import duckdb
+except ImportError:  # backend opcional: sin duckdb el dashboard sigue en pandas
+    duckdb = None
+
+# "pandas" (todo en memoria, por defecto) o "duckdb" (filtros y agregados en SQL sobre disco)
+BACKEND = os.environ.get("DASHBOARD_BACKEND", "pandas").lower()
+# Archivo DuckDB dentro del directorio de cada versión: se borra junto con ella
+STORE_FILE = os.environ.get("DASHBOARD_STORE", "Data.duckdb")
+# Cursores compartidos por todas las sesiones del proceso
+POOL_SIZE = int(os.environ.get("DASHBOARD_SQL_POOL", "4"))
+
+STORE_TABLES = ['rows', 'cases', 'checks', 'individuals']
+
+
+def sql_enabled(directory="."):
+    """True when the DuckDB backend is requested, installed, and the snapshot tables are on disk."""
+    return (BACKEND == "duckdb" and duckdb is not None and os.path.exists(os.path.join(directory, SNAPSHOT_FILE))
+            and all(os.path.exists(path) for path in table_paths(directory).values()))
+
+
+def quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def literal(value):
+    return "'" + value.replace("'", "''") + "'"
+
+
+def prepared_select(columns):
+    """SELECT list that applies prepare_dataset in SQL: assignee filled, original and KPI check status."""
+    select = ["coalesce(assignee_name, 'Un-assignee') AS assignee_name" if col == 'assignee_name' else quote(col)
+              for col in columns]
+    if 'check_status' in columns:
+        pending = ", ".join(literal(status) for status in PENDING_CHECK_STATUSES)
+        select.append("check_status AS check_status_original")
+        select.append(f"CASE WHEN check_status IN ({pending}) THEN 'pending' ELSE check_status END AS check_status_kpi")
+    return ", ".join(select)
+
+
+def stored_version(path):
+    if not os.path.exists(path):
+        return None
+    try:
+        con = duckdb.connect(path, read_only=True)
+        try:
+            return con.execute("SELECT version FROM store_meta").fetchone()[0]
+        finally:
+            con.close()
+    except duckdb.Error:
+        return None
+
+
+def store_path(directory="."):
+    return os.path.join(directory, STORE_FILE)
+
+
+def build_store(version, directory="."):
+    """Load the snapshot and the normalized tables in ``directory`` into its DuckDB file, unless it
+    already holds ``version``.
+
+    The joined table keeps the snapshot's row order in ``row_nr``. The file is built next to
+    its final name and swapped in once complete.
+    """
+    path = store_path(directory)
+    version = repr(version)
+    if stored_version(path) == version:
+        return
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    con = duckdb.connect(tmp_path)
+    try:
+        for name, source in dict(table_paths(directory), rows=os.path.join(directory, SNAPSHOT_FILE)).items():
+            select = prepared_select(pq.read_schema(source).names)
+            row_nr = "file_row_number AS row_nr, " if name == 'rows' else ""
+            con.execute(f"CREATE TABLE {name} AS SELECT {row_nr}{select} "
+                        f"FROM read_parquet($source, file_row_number=true) ORDER BY file_row_number",
+                        {'source': source})
+        con.execute("CREATE TABLE store_meta AS SELECT $version AS version", {'version': version})
+    finally:
+        con.close()
+    os.replace(tmp_path, path)
+
+
+def open_store(directory=".", pool_size=POOL_SIZE):
+    """Open the store in ``directory`` read-only with a pool of cursors that every session borrows from."""
+    connection = duckdb.connect(store_path(directory), read_only=True)
+    pool = queue.LifoQueue()
+    for _ in range(pool_size):
+        pool.put(connection.cursor())
+    types = {name: dict(row[:2] for row in connection.execute(f"DESCRIBE {name}").fetchall())
+             for name in STORE_TABLES}
+    store = {'connection': connection, 'pool': pool, 'types': types,
+             'columns': {name: list(columns) for name, columns in types.items()}}
+    store['entity_types'] = entity_types(store)
+    return store
+
+
+@contextmanager
+def borrow(store):
+    cursor = store['pool'].get()
+    try:
+        yield cursor
+    finally:
+        store['pool'].put(cursor)
+
+
+def query(store, sql, params=None):
+    with borrow(store) as con:
+        return con.execute(sql, params or {}).df()
+
+
+def missing_columns(store):
+    columns = store['columns']['rows']
+    return [col for col in DATE_COLUMNS + ['assignee_name', 'check_status'] if col not in columns]
+
+
+def distinct_values(store, table, column):
+    """Distinct non-null values of a column, in order of first appearance (the multiselect options)."""
+    frame = query(store, f"SELECT {quote(column)} AS value FROM {table} WHERE {quote(column)} IS NOT NULL "
+                         f"GROUP BY 1 ORDER BY min(rowid)")
+    return frame['value'].tolist()
+
+
+def date_bounds(store, column):
+    first, last = query(store, f"SELECT min({quote(column)}), max({quote(column)}) FROM cases").iloc[0]
+    return pd.Timestamp(first), pd.Timestamp(last)
+
+
+# Dashboard
+
+def dashboard_filter(store, filters):
+    """CTEs for the cases, checks and rows passing the Dashboard filters, the row condition and the parameters.
+
+    Same semantics as filter_index.compute_masks: a check needs its case and an address of its
+    individual to pass, and a case counts only if at least one of its checks is left.
+    """
+    date_column = filters['date_column']
+    if date_column not in DATE_COLUMNS:
+        raise ValueError(f"Unknown date column: {date_column}")
+    columns = store['columns']
+    params = {'start': pd.Timestamp(filters['start']).to_pydatetime(),
+              'end': pd.Timestamp(filters['end']).to_pydatetime()}
+
+    def conditions(table, names):
+        found = [col for col in names if col in columns[table]]
+        params.update({col: list(filters[col]) for col in found})
+        return [f"list_contains(${col}, {quote(col)})" for col in found]
+
+    case_where = [f"{date_column} >= $start", f"{date_column} < $end"] + conditions(
+        'cases', ['cases_status', 'assignee_name', 'risk_level'])
+    check_where = conditions('checks', ['check_status_original', 'check_type'])
+    address_where = conditions('individuals', ['country'])
+    if filters['is_pep'] is not None:
+        address_where.append("is_pep = $is_pep")
+        params['is_pep'] = bool(filters['is_pep'])
+    address_where = address_where or ["TRUE"]
+
+    ctes = f"""
+        WITH f_cases AS (SELECT * FROM cases WHERE {' AND '.join(case_where)}),
+        ok_individuals AS (SELECT DISTINCT individual_id FROM individuals WHERE {' AND '.join(address_where)}),
+        f_checks AS (
+            SELECT * FROM checks
+            WHERE {' AND '.join(check_where + ['TRUE'])}
+              AND case_id IN (SELECT case_id FROM f_cases)
+              AND individual_id IN (SELECT individual_id FROM ok_individuals)
+        ),
+        kept_cases AS (SELECT * FROM f_cases WHERE case_id IN (SELECT case_id FROM f_checks))
+    """
+    row_where = " AND ".join(["check_id IN (SELECT check_id FROM f_checks)"] + address_where)
+    return ctes, row_where, params
+
+
+def dashboard_summary(store, filters):
+    """The Dashboard summary dict (same keys as dashboard_kpis.tables_answer) from two grouped queries."""
+    ctes, _, params = dashboard_filter(store, filters)
+    month = f"strftime(c.{filters['date_column']}, '%Y-%m')"
+    cases = query(store, ctes + f"""
+        SELECT {month} AS "Month", c.assignee_name, c.cases_status, count(*) AS n
+        FROM kept_cases c GROUP BY ALL ORDER BY ALL""", params)
+    checks = query(store, ctes + f"""
+        SELECT {month} AS "Month", c.assignee_name, k.check_status_original, k.check_status_kpi, count(*) AS n
+        FROM f_checks k JOIN kept_cases c USING (case_id) GROUP BY ALL ORDER BY ALL""", params)
+
+    def total(frame, by):
+        return frame.groupby(by)['n'].sum()
+
+    return {
+        'case_counts': total(cases, 'cases_status'),
+        'total_cases': int(cases['n'].sum()),
+        'check_counts': total(checks, 'check_status_kpi'),
+        'total_checks': int(checks['n'].sum()),
+        'monthly_cases': total(cases, ['Month', 'assignee_name']).reset_index(name='Case Count'),
+        'monthly_checks': total(checks, ['Month', 'assignee_name']).reset_index(name='Check Count'),
+        'cases_by_status': total(cases, ['assignee_name', 'cases_status']),
+        'checks_by_status': total(checks, ['assignee_name', 'check_status_original']),
+    }
+
+
+# Filas: páginas y exportaciones
+
+def row_columns(store):
+    return [col for col in store['columns']['rows'] if col != 'row_nr']
+
+
+def row_source(store, ctes, where, params):
+    """Row source for data_grid.paginated_table: search, sort and paging run in SQL."""
+    columns = row_columns(store)
+    select = ", ".join(quote(col) for col in columns)
+    text_columns = [col for col in columns if store['types']['rows'][col] == 'VARCHAR']
+
+    def matching(search):
+        if not search:
+            return where, params
+        hits = " OR ".join(f"contains(lower({quote(col)}), $search)" for col in text_columns) or "FALSE"
+        return f"{where} AND ({hits})", dict(params, search=search.lower())
+
+    def count(search):
+        condition, values = matching(search)
+        return int(query(store, f"{ctes} SELECT count(*) AS n FROM rows WHERE {condition}", values)['n'].iloc[0])
+
+    def page(search, sort_by, descending, start, stop):
+        condition, values = matching(search)
+        order = "row_nr"
+        if sort_by is not None:
+            order = f"{quote(sort_by)} {'DESC' if descending else 'ASC'} NULLS LAST, row_nr"
+        return query(store, f"{ctes} SELECT {select} FROM rows WHERE {condition} "
+                            f"ORDER BY {order} LIMIT {int(stop - start)} OFFSET {int(start)}", values)
+
+    return {'columns': columns, 'count': count, 'page': page}
+
+
+def export_chunks(store, ctes, where, params, rows=EXPORT_CHUNK_ROWS):
+    """The matching rows as DataFrame chunks, streamed from the store (always at least one chunk)."""
+    select = ", ".join(quote(col) for col in row_columns(store))
+    with borrow(store) as con:
+        result = con.execute(f"{ctes} SELECT {select} FROM rows WHERE {where} ORDER BY row_nr", params)
+        reader = result.to_arrow_reader(rows) if hasattr(result, 'to_arrow_reader') else result.fetch_record_batch(rows)
+        empty = True
+        for batch in reader:
+            empty = False
+            yield batch.to_pandas()
+        if empty:
+            yield reader.schema.empty_table().to_pandas()
+
+
+# KYC
+
+def entity_types(store):
+    """entity_type values tagged as individual / as business, parsed once per store."""
+    values = distinct_values(store, 'rows', 'entity_type') if 'entity_type' in store['columns']['rows'] else []
+    tags = {value: parse_tags(value) for value in values}
+    return {'individual': [value for value, value_tags in tags.items() if is_individual(value_tags)],
+            'business': [value for value, value_tags in tags.items() if is_business(value_tags)]}
+
+
+def kyc_filter(date_filter, today, selections=None):
+    """Row condition and parameters for the KYC date window and the selected filter values."""
+    where, params = ["TRUE"], {}
+    cutoff = window_start(date_filter, today)
+    if cutoff is not None:
+        where.append("created_at >= $cutoff")
+        params['cutoff'] = cutoff.to_pydatetime()
+    for col, value in (selections or {}).items():
+        if value != "All":
+            where.append(f"{quote(col)} = ${col}")
+            params[col] = value
+    return " AND ".join(where), params
+
+
+def kyc_options(store, col, where, params):
+    """Distinct non-null values of a column among the matching rows, in order of first appearance."""
+    frame = query(store, f"SELECT {quote(col)} AS value FROM rows WHERE {where} AND {quote(col)} IS NOT NULL "
+                         f"GROUP BY 1 ORDER BY min(row_nr)", params)
+    return frame['value'].tolist()
+
+
+def kyc_kpis(store, where, params):
+    """The six KYC KPIs (same definitions as kyc_metrics.kyc_kpis) in one query."""
+    in_review = "check_status = 'need_review'"
+    open_in_review = f"cases_status = 'open' AND {in_review}"
+    values = dict(params, individual_entities=store['entity_types']['individual'],
+                  business_entities=store['entity_types']['business'])
+    frame = query(store, f"""
+        SELECT
+            count(DISTINCT case_id) AS total_kyc_cases,
+            count(DISTINCT case_id) FILTER (WHERE cases_status = 'open') AS completed_kyc_cases,
+            count(DISTINCT check_id) FILTER (WHERE check_type = 'aml' AND {in_review}
+                                             AND cases_status IN ('open', 'approved')) AS aml_alerts,
+            count(DISTINCT check_id) FILTER (WHERE check_type = 'id_verification' AND {open_in_review}) AS idv_alerts,
+            count(DISTINCT check_id) FILTER (WHERE check_type IN ('id_document', 'document') AND {open_in_review}
+                                             AND list_contains($individual_entities, entity_type)) AS document_alerts,
+            count(DISTINCT check_id) FILTER (WHERE check_type = 'document' AND {open_in_review}
+                                             AND list_contains($business_entities, entity_type))
+                AS document_alerts_companies
+        FROM rows WHERE {where}""", values)
+    return {col: int(value) for col, value in frame.iloc[0].items()}
@@ -0,0 +1,61 @@
+import os
+import sys
+import pytest
+
+# Los módulos del dashboard viven en la raíz del repositorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fixture import sqlite_engine, load_fixture  # noqa: E402
+from benchmarks.synthetic import generate_rows  # noqa: E402
+from data_store import (prepare_dataset, split_tables, prepare_tables, write_snapshot, write_tables,  # noqa: E402
+                        SNAPSHOT_FILE)
+from filter_index import build_filter_index, distinct_values, date_bounds  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def tables():
+    """Prepared case / check / individual tables of a small synthetic dataset."""
+    df, _ = prepare_dataset(next(generate_rows(2000, seed=7, now="2026-01-01")))
+    return prepare_tables(split_tables(df))
+
+
+@pytest.fixture(scope="session")
+def table_dir(tmp_path_factory):
+    """A directory with the snapshot and table files of the same synthetic dataset as ``tables``."""
+    directory = tmp_path_factory.mktemp("tables")
+    path = str(directory / SNAPSHOT_FILE)
+    write_snapshot([next(generate_rows(2000, seed=7, now="2026-01-01"))], path=path, csv_path=None)
+    write_tables(path, directory=str(directory))
+    return str(directory)
+
+
+@pytest.fixture(scope="session")
+def filter_index(tables):
+    return build_filter_index(tables)
+
+
+@pytest.fixture
+def source(tmp_path, monkeypatch):
+    """A SQLite stand-in for the source database, with the refresh running inside ``tmp_path``."""
+    monkeypatch.chdir(tmp_path)
+    engine = sqlite_engine(str(tmp_path / "source.db"))
+    load_fixture(engine, 300, seed=3)
+    return engine
+
+
+@pytest.fixture
+def all_filters(filter_index):
+    """Dashboard filters with every value selected over the whole created_at range."""
+    start, end = date_bounds(filter_index['dates']['created_at'])
+    return {
+        'cases_status': distinct_values(filter_index, 'cases', 'cases_status'),
+        'assignee_name': distinct_values(filter_index, 'cases', 'assignee_name'),
+        'risk_level': distinct_values(filter_index, 'cases', 'risk_level'),
+        'check_status_original': distinct_values(filter_index, 'checks', 'check_status_original'),
+        'check_type': distinct_values(filter_index, 'checks', 'check_type'),
+        'country': distinct_values(filter_index, 'individuals', 'country'),
+        'is_pep': None,
+        'date_column': 'created_at',
+        'start': start,
+        'end': end,
+    }
@@ -0,0 +1,29 @@
+import pandas as pd
+import pytest
+from agent_stats import case_lifecycle, compute_agent_stats, lookup, TEAM_GROUP
+
+TODAY = pd.Timestamp("2026-01-01")
+
+
+@pytest.mark.parametrize("rows", [None, 0], ids=["no closed cases", "empty dataset"])
+def test_stats_without_closed_cases(tables, rows):
+    # Todos los casos abiertos: no hay tiempos de resolución para los cuartiles
+    cases = tables['cases'].assign(cases_status='open').iloc[:rows]
+    checks = tables['checks'].iloc[:rows]
+    stats = compute_agent_stats(cases, case_lifecycle(cases), checks, TODAY)
+    assert stats['resolution_box'].empty
+    assert list(stats['resolution_box'].columns) == ['q1', 'median', 'q3', 'lower', 'upper']
+    assert stats['resolution_outliers'].empty
+    summary = lookup(stats['summary'], 'team', TEAM_GROUP)
+    assert int(summary['approved_cases'].sum()) == int(summary['rejected_cases'].sum()) == 0
+    assert summary['approval_rate'].isna().all()
+    assert (stats['summary']['open_cases'] == stats['summary']['total_cases']).all()
+
+
+def test_approval_rate_over_decided_cases(tables):
+    cases = tables['cases']
+    stats = compute_agent_stats(cases, case_lifecycle(cases), tables['checks'], TODAY)
+    summary = stats['summary']
+    decided = summary['approved_cases'] + summary['rejected_cases']
+    assert (summary['approval_rate'] == (summary['approved_cases'] / decided).round(4)).all()
+    assert ((summary['approval_rate'] > 0) & (summary['approval_rate'] < 1)).any()
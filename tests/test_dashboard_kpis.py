@@ -0,0 +1,74 @@
+import pandas as pd
+import pytest
+from dashboard_kpis import tables_answer, write_rollup, read_rollup, rollup_answer, ROLLUP_FILE
+from data_store import prepare_tables, read_tables
+from filter_index import build_filter_index, filter_masks
+
+
+def test_tables_answer_counts_every_case_and_check(tables, filter_index, all_filters):
+    all_filters['end'] = pd.Timestamp(all_filters['end']) + pd.Timedelta(days=1)
+    masks = filter_masks(filter_index, all_filters)
+    summary = tables_answer(tables['cases'], tables['checks'], masks, 'created_at')
+    assert summary['total_cases'] == int(masks['cases'].sum())
+    assert summary['case_counts'].sum() == summary['total_cases']
+    assert summary['cases_by_status'].sum() == summary['total_cases']
+    assert summary['total_checks'] > 0
+
+
+def test_tables_answer_empty_selection(tables, filter_index, all_filters):
+    for filters in [dict(all_filters, cases_status=[]), dict(all_filters, country=[])]:
+        summary = tables_answer(tables['cases'], tables['checks'], filter_masks(filter_index, filters), 'created_at')
+        assert summary['total_cases'] == 0 and summary['total_checks'] == 0
+        # Las tablas por asignado se muestran con unstack() aunque no quede nada
+        assert summary['cases_by_status'].unstack(fill_value=0).empty
+        assert summary['checks_by_status'].unstack(fill_value=0).empty
+
+
+@pytest.fixture(scope="module")
+def rollup_tables(table_dir):
+    tables = prepare_tables(read_tables(table_dir))
+    write_rollup(tables['cases'], table_dir)
+    return tables, build_filter_index(tables), read_rollup(f"{table_dir}/{ROLLUP_FILE}")
+
+
+def whole_months(filters, date_column, first, last):
+    return dict(filters, date_column=date_column, start=pd.Timestamp(first), end=pd.Timestamp(last))
+
+
+@pytest.mark.parametrize("date_column", ['created_at', 'last_activity_cases'])
+def test_rollup_matches_tables(rollup_tables, all_filters, date_column):
+    tables, index, rollup = rollup_tables
+    assignees = list(all_filters['assignee_name'])
+    selections = [
+        whole_months(all_filters, date_column, "2000-01-01", "2100-01-01"),
+        whole_months(all_filters, date_column, "2025-03-01", "2025-09-01"),
+        whole_months(dict(all_filters, assignee_name=assignees[:2], cases_status=all_filters['cases_status'][:1]),
+                     date_column, "2025-01-01", "2026-01-01"),
+        whole_months(dict(all_filters, assignee_name=[]), date_column, "2000-01-01", "2100-01-01"),
+    ]
+    for filters in selections:
+        expected = tables_answer(tables['cases'], tables['checks'], filter_masks(index, filters), date_column)
+        summary = rollup_answer(rollup, index, filters)
+        assert summary is not None
+        assert summary['total_cases'] == expected['total_cases']
+        assert summary['total_checks'] == expected['total_checks']
+        for key in ['case_counts', 'check_counts']:
+            # value_counts() también lista las categorías sin filas
+            pd.testing.assert_series_equal(summary[key], expected[key][expected[key] > 0],
+                                           check_names=False, check_index_type=False, check_categorical=False)
+        for key in ['monthly_cases', 'monthly_checks']:
+            pd.testing.assert_frame_equal(summary[key], expected[key], check_dtype=False, check_categorical=False)
+        for key in ['cases_by_status', 'checks_by_status']:
+            pd.testing.assert_series_equal(summary[key], expected[key], check_names=False, check_dtype=False)
+
+
+def test_rollup_falls_back(rollup_tables, all_filters):
+    tables, index, rollup = rollup_tables
+    filters = whole_months(all_filters, 'created_at', "2000-01-01", "2100-01-01")
+    assert rollup_answer(None, index, filters) is None
+    assert rollup_answer(rollup, index, dict(filters, is_pep=True)) is None
+    assert rollup_answer(rollup, index, dict(filters, country=all_filters['country'][1:])) is None
+    assert rollup_answer(rollup, index, dict(filters, check_type=[])) is None
+    # Un rango que corta un mes con casos no se puede responder por meses
+    start, end = all_filters['start'], all_filters['end']
+    assert rollup_answer(rollup, index, dict(filters, start=start, end=end)) is None
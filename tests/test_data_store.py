@@ -0,0 +1,84 @@
+import os
+import pandas as pd
+import pytest
+from benchmarks.synthetic import generate_rows
+from data_store import (UNDATED_PARTITION, write_snapshot, write_partitions, read_manifest, overlapping_partitions,
+                        read_partitions)
+
+
+@pytest.fixture
+def raw():
+    """Synthetic extraction rows, a few of them without created_at (the undated partition)."""
+    df = next(generate_rows(2000, seed=7, now="2026-01-01"))
+    df.loc[df.index[:5], 'created_at'] = pd.NaT
+    return df
+
+
+def publish(df, directory, previous=None):
+    """Write ``df`` as a snapshot in ``directory`` and partition it; returns the rewritten partitions."""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, "Data.parquet")
+    write_snapshot([df], path=path, csv_path=None)
+    return write_partitions(path, directory=os.path.join(directory, "parts"),
+                            previous_directory=os.path.join(previous, "parts") if previous else None)
+
+
+def manifest_of(directory):
+    return read_manifest(os.path.join(directory, "parts", "manifest.json"))
+
+
+def test_unchanged_partitions_are_reused(raw, tmp_path):
+    first, second = str(tmp_path / "v1"), str(tmp_path / "v2")
+    written = publish(raw, first)
+    assert UNDATED_PARTITION in written and len(written) == len(manifest_of(first)['partitions'])
+    assert publish(raw, first) == []
+
+    # Mismas filas en otro orden (p. ej. extracción en paralelo): ninguna partición cambia
+    assert publish(raw.iloc[::-1], second, previous=first) == []
+    for name, entry in manifest_of(second)['partitions'].items():
+        assert os.path.samefile(os.path.join(first, "parts", entry['file']), os.path.join(second, "parts", entry['file']))
+    assert manifest_of(second)['partitions'] == manifest_of(first)['partitions']
+
+
+def test_only_changed_partitions_are_rewritten(raw, tmp_path):
+    first, second = str(tmp_path / "v1"), str(tmp_path / "v2")
+    publish(raw, first)
+    month = raw['created_at'].dropna().iloc[0].strftime('%Y-%m')
+    changed = raw.copy()
+    changed.loc[changed['created_at'].dt.strftime('%Y-%m') == month, 'cases_status'] = 'closed'
+    assert publish(changed, second, previous=first) == [month]
+    parts = read_partitions([month], manifest_of(second), directory=os.path.join(second, "parts"))
+    assert (parts['cases_status'] == 'closed').all()
+
+
+def test_removed_partitions_are_deleted(raw, tmp_path):
+    directory = str(tmp_path / "v1")
+    publish(raw, directory)
+    month = raw['created_at'].dropna().iloc[0].strftime('%Y-%m')
+    file_path = os.path.join(directory, "parts", f"{month}.parquet")
+    assert os.path.exists(file_path)
+    assert publish(raw[raw['created_at'].dt.strftime('%Y-%m') != month], directory) == []
+    assert month not in manifest_of(directory)['partitions']
+    assert not os.path.exists(file_path)
+
+
+def test_overlapping_partitions_bounds(raw, tmp_path):
+    directory = str(tmp_path / "v1")
+    publish(raw, directory)
+    manifest = manifest_of(directory)
+    months = [name for name in manifest['partitions'] if name != UNDATED_PARTITION]
+    assert overlapping_partitions(manifest, 'created_at') == months + [UNDATED_PARTITION]
+
+    entry = manifest['partitions'][months[1]]
+    first, last = pd.Timestamp(entry['min']['created_at']), pd.Timestamp(entry['max']['created_at'])
+    # El fin es exclusivo: un rango que termina en el primer valor de la partición no la toca
+    assert months[1] not in overlapping_partitions(manifest, 'created_at', end=first)
+    assert months[1] in overlapping_partitions(manifest, 'created_at', end=first + pd.Timedelta(microseconds=1))
+    assert months[1] in overlapping_partitions(manifest, 'created_at', start=last)
+    assert months[1] not in overlapping_partitions(manifest, 'created_at', start=last + pd.Timedelta(microseconds=1))
+    assert overlapping_partitions(manifest, 'created_at', start=first, end=last + pd.Timedelta(days=1))[0] == months[1]
+
+    # Las filas sin created_at solo se leen sin límites de fecha; por last_activity_cases sí tienen rango
+    assert UNDATED_PARTITION not in overlapping_partitions(manifest, 'created_at', start="2000-01-01", end="2100-01-01")
+    assert UNDATED_PARTITION in overlapping_partitions(manifest, 'last_activity_cases',
+                                                       start="2000-01-01", end="2100-01-01")
@@ -0,0 +1,46 @@
+import time
+from benchmarks.fixture import sqlite_engine
+from refresh_service import start_refresh_service
+from snapshots import current_version
+from update_data import fetch_and_save_data
+
+
+def wait_until(condition, timeout):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.05)
+
+
+def stop(status):
+    """Stop the service thread and let a run in progress finish before the test's directory goes away."""
+    status['stop'].set()
+    wait_until(lambda: not status['running'], 60)
+
+
+def test_service_publishes_a_version(source, tmp_path):
+    published = []
+    status = start_refresh_service(refresh=lambda: fetch_and_save_data(engine=sqlite_engine(str(tmp_path / "source.db"))),
+                                   on_publish=published.append, interval=3600, jitter=0, first_retry=0.2)
+    try:
+        wait_until(lambda: published, 120)
+    finally:
+        stop(status)
+    assert published == [current_version()]
+    assert status['failures'] == 0 and status['last_error'] is None
+    assert status['last_success'] is not None
+
+
+def test_failed_refresh_backs_off(tmp_path):
+    started = time.monotonic()
+    status = start_refresh_service(refresh=lambda: 1 / 0, interval=3600, jitter=0, first_retry=0.2,
+                                   root=str(tmp_path / "snapshots"))
+    try:
+        wait_until(lambda: status['runs'] >= 3, 30)
+    finally:
+        stop(status)
+    # Reintentos a los 0.2 s y 0.4 s del fallo anterior, sin pasar del intervalo
+    assert time.monotonic() - started >= 0.6
+    assert status['failures'] == status['runs'] and status['runs'] <= 4
+    assert 'ZeroDivisionError' in status['last_error']
+    assert status['last_success'] is None
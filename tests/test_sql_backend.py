@@ -0,0 +1,90 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from data_store import SNAPSHOT_FILE, read_snapshot, prepare_dataset, prepare_tables, read_tables
+from dashboard_kpis import tables_answer
+from filter_index import build_filter_index, filter_masks, row_positions, rows_mask
+import kyc_metrics
+
+duckdb = pytest.importorskip("duckdb")
+import sql_backend  # noqa: E402
+
+TODAY = pd.Timestamp("2026-01-01")
+
+
+@pytest.fixture(scope="module")
+def store(table_dir):
+    sql_backend.build_store(("test",), directory=table_dir)
+    store = sql_backend.open_store(table_dir)
+    yield store
+    store['connection'].close()
+
+
+@pytest.fixture(scope="module")
+def dataset(table_dir):
+    """The same version in memory: prepared rows, tables, filter index and row positions."""
+    df, _ = prepare_dataset(read_snapshot(os.path.join(table_dir, SNAPSHOT_FILE)))
+    tables = prepare_tables(read_tables(table_dir))
+    return {'df': df, 'tables': tables, 'index': build_filter_index(tables), 'positions': row_positions(df, tables)}
+
+
+def counts(series):
+    """Non-zero counts by plain value (value_counts() also lists the categories without rows)."""
+    return {tuple(map(str, key)) if isinstance(key, tuple) else str(key): int(n) for key, n in series.items() if n}
+
+
+def records(frame):
+    return sorted(tuple(str(value) for value in row) for row in frame.itertuples(index=False))
+
+
+def selections(all_filters):
+    whole = dict(all_filters, end=pd.Timestamp(all_filters['end']) + pd.Timedelta(days=1))
+    return {
+        'everything': whole,
+        'last activity': dict(whole, date_column='last_activity_cases',
+                              start=pd.Timestamp("2025-02-10"), end=pd.Timestamp("2025-07-20")),
+        'narrowed': dict(whole, cases_status=['open', 'approved'], assignee_name=whole['assignee_name'][:5],
+                         check_status_original=['need_review', 'approved'], country=whole['country'][:3]),
+        'pep': dict(whole, is_pep=True),
+        'no status': dict(whole, cases_status=[]),
+        'no country': dict(whole, country=[]),
+    }
+
+
+def test_store_lives_in_the_version_directory(store, table_dir):
+    assert os.path.exists(os.path.join(table_dir, sql_backend.STORE_FILE))
+
+
+@pytest.mark.parametrize("name", ['everything', 'last activity', 'narrowed', 'pep', 'no status', 'no country'])
+def test_dashboard_matches_pandas(store, dataset, all_filters, name):
+    filters = selections(all_filters)[name]
+    masks = filter_masks(dataset['index'], filters)
+    expected = tables_answer(dataset['tables']['cases'], dataset['tables']['checks'], masks, filters['date_column'])
+    summary = sql_backend.dashboard_summary(store, filters)
+    assert summary['total_cases'] == expected['total_cases']
+    assert summary['total_checks'] == expected['total_checks']
+    for key in ['case_counts', 'check_counts', 'cases_by_status', 'checks_by_status']:
+        assert counts(summary[key]) == counts(expected[key]), key
+    for key in ['monthly_cases', 'monthly_checks']:
+        assert records(summary[key]) == records(expected[key]), key
+
+    ctes, where, params = sql_backend.dashboard_filter(store, filters)
+    rows = int(np.count_nonzero(rows_mask(masks, dataset['positions'])))
+    assert sql_backend.row_source(store, ctes, where, params)['count']("") == rows
+    if name.startswith('no '):
+        assert summary['total_cases'] == summary['total_checks'] == rows == 0
+        assert summary['cases_by_status'].unstack(fill_value=0).empty
+
+
+@pytest.mark.parametrize("date_filter", list(kyc_metrics.DATE_WINDOWS))
+@pytest.mark.parametrize("chosen", [{}, {'cases_status': "open"}, {'check_type': "aml", 'country': "nowhere"}],
+                         ids=["all", "open", "empty"])
+def test_kyc_matches_pandas(store, dataset, date_filter, chosen):
+    index = kyc_metrics.build_kyc_index(dataset['df'])
+    chosen = dict(dict.fromkeys(kyc_metrics.KYC_FILTER_COLUMNS, "All"), **chosen)
+    positions = kyc_metrics.apply_filters(index, kyc_metrics.window_positions(index, date_filter, TODAY), chosen)
+    where, params = sql_backend.kyc_filter(date_filter, TODAY, chosen)
+    assert sql_backend.kyc_kpis(store, where, params) == kyc_metrics.kyc_kpis(index, positions)
+    count = sql_backend.query(store, f"SELECT count(*) AS n FROM rows WHERE {where}", params)['n'].iloc[0]
+    assert int(count) == len(positions)
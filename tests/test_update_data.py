@@ -0,0 +1,44 @@
+import os
+import pandas as pd
+from sqlalchemy import text
+from agent_stats import LIFECYCLE_FILE, read_lifecycle
+from data_store import SNAPSHOT_FILE, read_snapshot, read_tables
+from snapshots import current_version, version_path, read_version_manifest
+from update_data import upsert_rows, fetch_and_save_data
+
+
+def test_upsert_replaces_every_row_of_a_changed_case():
+    existing = pd.DataFrame({'case_id': ['a', 'a', 'b'], 'check_id': ['1', '2', '3'],
+                             'cases_status': ['approved', 'approved', 'open']})
+    delta = pd.DataFrame({'case_id': ['a'], 'check_id': ['1'], 'cases_status': ['rejected']})
+    merged = pd.concat(upsert_rows([existing.iloc[:2], existing.iloc[2:]], delta), ignore_index=True)
+    assert sorted(merged['check_id']) == ['1', '3']
+    assert merged.set_index('check_id').loc['1', 'cases_status'] == 'rejected'
+
+
+def test_incremental_refresh_drops_deleted_checks(source):
+    fetch_and_save_data(full=True, engine=source)
+    with source.begin() as conn:
+        case_id, check_id = conn.execute(text("""
+            SELECT c.id, k.id FROM auth.dotfile_cases c
+            JOIN auth.dotfile_individuals i ON i.case_id = c.id
+            JOIN auth.dotfile_checks k ON k.individual_id = i.id
+            WHERE c.status = 'approved' AND c.created_at IS NOT NULL
+              AND (SELECT count(*) FROM auth.dotfile_individuals i2
+                   JOIN auth.dotfile_checks k2 ON k2.individual_id = i2.id WHERE i2.case_id = c.id) > 1
+            LIMIT 1""")).one()
+        conn.execute(text("DELETE FROM auth.dotfile_checks WHERE id = :id"), {'id': check_id})
+        conn.execute(text("UPDATE auth.dotfile_cases SET status = 'rejected', "
+                          "last_activity_at = '2030-01-01 00:00:00.000000' WHERE id = :id"), {'id': case_id})
+
+    version = fetch_and_save_data(engine=source)
+    assert version == current_version() and read_version_manifest(version)['mode'] == 'incremental'
+    directory = version_path(version)
+    snapshot = read_snapshot(os.path.join(directory, SNAPSHOT_FILE))
+    rows = snapshot[snapshot['case_id'] == case_id]
+    assert len(rows) > 0 and check_id not in set(rows['check_id'])
+    assert set(rows['cases_status'].astype(str)) == {'rejected'}
+    cases = read_tables(directory)['cases'].set_index('case_id')
+    assert cases.loc[case_id, 'cases_status'] == 'rejected'
+    lifecycle = read_lifecycle(os.path.join(directory, LIFECYCLE_FILE)).set_index('case_id')
+    assert lifecycle.loc[case_id, 'cases_status'] == 'rejected' and lifecycle.loc[case_id, 'closed']
@@ -1,32 +1,57 @@
 import os
+import json
+import time
+import shutil
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
 import pandas as pd
-from sqlalchemy import create_engine
+import pyarrow.parquet as pq
+from datetime import datetime, timezone
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import SQLAlchemyError
 from dotenv import load_dotenv
+from data_store import (SNAPSHOT_FILE, CSV_FILE, PARTITION_DIR, normalize_types, to_naive_datetime,
+                        write_snapshot, read_snapshot_chunks, write_tables, read_tables, table_paths, write_partitions,
+                        prepare_tables)
+from agent_stats import LIFECYCLE_FILE, write_lifecycle
+from dashboard_kpis import write_rollup
+from profiling import start_trace, lap, format_trace, write_metrics
+from snapshots import (current_version, version_path, new_version_id, staging_dir, publish, link_or_copy,
+                       collect_garbage, acquire_refresh_lock, release_refresh_lock)
 
 # Cargar variables de entorno
 load_dotenv()
 
-# Conectar a la base de datos
-def connect_to_db():
-    engine = create_engine(
-        f"postgresql+psycopg2://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}"
-        f"@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
-    )
-    return engine
+# Estado persistente del modo incremental (marca de agua y contador de corridas)
+STATE_FILE = "refresh_state.json"
+# Tiempos por etapa de la última actualización, en formato de texto de Prometheus (vacío: no se escribe)
+REFRESH_METRICS_FILE = os.getenv("REFRESH_METRICS_FILE", "refresh_metrics.prom")
+# Cada cuántas corridas incrementales se hace una reconciliación completa (para reflejar borrados)
+FULL_RECONCILE_EVERY = int(os.getenv("FULL_RECONCILE_EVERY", "9"))
+# Una fila del dataset se identifica por (case_id, check_id); puede repetirse por cada dirección
+KEY_COLUMNS = ["case_id", "check_id"]
+# Filas por lote del cursor del lado del servidor; acota la memoria pico del job
+CHUNK_SIZE = int(os.getenv("REFRESH_CHUNK_SIZE", "50000"))
+# Consultas en paralelo durante la reconciliación completa (1 = una sola consulta serial)
+PARALLELISM = int(os.getenv("REFRESH_PARALLELISM", "1"))
+# Cómo se parte la extracción: "month" (mes de created_at) o "hash" (hash de case_id, solo PostgreSQL)
+PARTITION_BY = os.getenv("REFRESH_PARTITION_BY", "month")
+# Reintentos de una partición que falla, antes de abortar la corrida
+PARTITION_RETRIES = int(os.getenv("REFRESH_PARTITION_RETRIES", "2"))
+# Particiones por hilo en modo hash, para repartir mejor la carga
+HASH_PARTITIONS_PER_WORKER = 4
 
-# Obtener los datos de PostgreSQL y guardarlos en Data.csv
-def fetch_and_save_data():
-    engine = connect_to_db()
-    query = """
-     SELECT 
+BASE_QUERY = """
+     SELECT
             auth.dotfile_cases.id as Case_ID,
             q.individual_id as individual_id,
             auth.dotfile_cases.status as cases_status,
-            q.type as check_type,  
+            q.type as check_type,
             q.id as check_id,
-            q.status as check_status,    
+            q.status as check_status,
             auth.dotfile_cases.tags as entity_type,
-            auth.dotfile_cases.assignee_fullname as assignee_name,  
+            auth.dotfile_cases.assignee_fullname as assignee_name,
             auth.dotfile_cases.assignee_email as assignee_email,
             auth.dotfile_cases.created_at as created_at,
             auth.dotfile_cases.last_activity_at as last_activity_cases,
@@ -35,19 +60,361 @@ def fetch_and_save_data():
             auth.dotfile_individuals.employment_status as employment_status,
             auth.dotfile_addresses.country as country
         FROM auth.dotfile_cases
-        INNER JOIN auth.dotfile_individuals 
+        INNER JOIN auth.dotfile_individuals
             ON auth.dotfile_cases.id = auth.dotfile_individuals.case_id
         INNER JOIN auth.dotfile_checks q
             ON auth.dotfile_individuals.id = q.individual_id
-        INNER JOIN auth.dotfile_addresses 
-            ON auth.dotfile_individuals.id = auth.dotfile_addresses.individual_id;
+        INNER JOIN auth.dotfile_addresses
+            ON auth.dotfile_individuals.id = auth.dotfile_addresses.individual_id
+"""
+
+# Solo los casos con actividad desde la última marca de agua
+INCREMENTAL_FILTER = """
+        WHERE auth.dotfile_cases.last_activity_at >= :watermark
+"""
+
+# Orden fijo dentro de cada partición: las filas que empatan en las tres columnas son idénticas
+PARTITION_ORDER = """
+        ORDER BY case_id, check_id, country
+"""
+
+HASH_FILTER = """
+        WHERE mod(CAST(hashtext(CAST(auth.dotfile_cases.id AS text)) AS bigint) + 2147483648, :buckets) = :bucket
+"""
+
+# Conectar a la base de datos; con pool_size, un pool acotado compartido por los hilos de extracción.
+# DATABASE_URL, si está definida, reemplaza las variables DB_* (p. ej. una base local de pruebas)
+def connect_to_db(pool_size=None):
+    options = {} if pool_size is None else {'pool_size': pool_size, 'max_overflow': 0, 'pool_pre_ping': True}
+    engine = create_engine(
+        os.getenv('DATABASE_URL') or
+        f"postgresql+psycopg2://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}"
+        f"@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}",
+        **options
+    )
+    return engine
+
+# Leer / guardar el estado del modo incremental
+def load_state(path=STATE_FILE):
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {}
+
+def save_state(state, path=STATE_FILE):
+    with open(path, "w") as f:
+        json.dump(state, f, indent=2)
+
+def stream_query(engine, query, params=None, chunksize=CHUNK_SIZE):
+    """Yield the query result in DataFrame chunks read through a server-side (named) cursor."""
+    with engine.connect().execution_options(stream_results=True, max_row_buffer=chunksize) as conn:
+        for chunk in pd.read_sql(text(query), conn, params=params, chunksize=chunksize):
+            # Normalizar nombres de columnas igual que main.py
+            chunk.columns = chunk.columns.str.strip().str.lower()
+            yield chunk
+
+def run_query(engine, query, params=None):
+    """Run the extraction query and return the whole (small) result as one DataFrame."""
+    chunks = list(stream_query(engine, query, params=params))
+    if not chunks:
+        return pd.DataFrame(columns=KEY_COLUMNS)
+    return pd.concat(chunks, ignore_index=True)
+
+def utc_text(timestamp):
+    """A UTC-naive snapshot timestamp as text with an explicit offset, for Postgres parameters."""
+    return timestamp.tz_localize('UTC').isoformat(sep=' ')
+
+def month_partitions(engine):
+    """One partition per created_at month (UTC), plus one for cases without created_at.
+
+    The first and last months are open-ended so rows created during the run are not lost.
+    """
+    bounds = run_query(engine, "SELECT min(created_at) AS first_created, max(created_at) AS last_created "
+                               "FROM auth.dotfile_cases")
+    first, last = (to_naive_datetime(bounds[col])[0] for col in ['first_created', 'last_created'])
+    partitions = []
+    if not pd.isna(first):
+        months = pd.period_range(first.to_period('M'), last.to_period('M'), freq='M')
+        for i, month in enumerate(months):
+            conditions, params = ["auth.dotfile_cases.created_at IS NOT NULL"], {}
+            if i > 0:
+                conditions.append("auth.dotfile_cases.created_at >= :start")
+                params['start'] = utc_text(month.start_time)
+            if i < len(months) - 1:
+                conditions.append("auth.dotfile_cases.created_at < :end")
+                params['end'] = utc_text((month + 1).start_time)
+            partitions.append({'name': str(month), 'filter': "\n        WHERE " + " AND ".join(conditions),
+                               'params': params})
+    partitions.append({'name': "sin created_at", 'filter': "\n        WHERE auth.dotfile_cases.created_at IS NULL",
+                       'params': {}})
+    return partitions
+
+def hash_partitions(buckets):
+    """``buckets`` partitions by a hash of the case ID (PostgreSQL's hashtext)."""
+    return [{'name': f"hash {bucket + 1}/{buckets}", 'filter': HASH_FILTER,
+             'params': {'buckets': buckets, 'bucket': bucket}} for bucket in range(buckets)]
+
+def extract_partition(engine, partition, path, chunksize=CHUNK_SIZE, retries=PARTITION_RETRIES):
+    """Stream one partition into its own Parquet part file, retrying only this partition on failure."""
+    query = BASE_QUERY + partition['filter'] + PARTITION_ORDER
+    for attempt in range(retries + 1):
+        try:
+            rows = write_snapshot(stream_query(engine, query, params=partition['params'], chunksize=chunksize),
+                                  path=path, csv_path=None)
+            print(f"   ✔️ Partición {partition['name']}: {rows:,} filas")
+            return rows
+        except (SQLAlchemyError, OSError) as error:
+            if attempt == retries:
+                raise
+            print(f"   ⚠️ Partición {partition['name']} falló ({error}); reintento {attempt + 1}/{retries}")
+            time.sleep(2 ** attempt)
+
+def read_parts(paths, chunksize=CHUNK_SIZE):
+    for path in paths:
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+
+def fetch_partitioned(engine, partitions, workers, chunksize=CHUNK_SIZE):
+    """Extract the partitions on a thread pool, then yield their rows in partition order.
+
+    Each partition lands in a part file first, so the merge order does not depend on which
+    query finishes first. If a partition still fails after its retries, the pending ones are
+    cancelled and the error propagates before anything reaches the snapshot.
     """
-    df = pd.read_sql(query, engine)
-    
-    # Guardar en Data.csv
-    df.to_csv("Data.csv", index=False)
-    print("✅ Data actualizada y guardada en Data.csv")
+    part_dir = tempfile.mkdtemp(prefix="refresh_parts_", dir=os.path.dirname(os.path.abspath(SNAPSHOT_FILE)))
+    paths = [os.path.join(part_dir, f"part-{i:05d}.parquet") for i in range(len(partitions))]
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(extract_partition, engine, partition, path, chunksize)
+                       for partition, path in zip(partitions, paths)]
+            done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+            failed = [future for future in done if future.exception() is not None]
+            if failed:
+                for future in futures:
+                    future.cancel()
+                raise failed[0].exception()
+        yield from read_parts(paths, chunksize)
+    finally:
+        shutil.rmtree(part_dir, ignore_errors=True)
+
+def compute_watermark(df):
+    """Return the high-water mark on last_activity_cases and the set of check IDs sitting exactly on it."""
+    last_activity = to_naive_datetime(df['last_activity_cases'])
+    watermark = last_activity.max()
+    if pd.isna(watermark):
+        return None, set()
+    return watermark, set(df.loc[last_activity == watermark, 'check_id'].astype(str))
+
+def merge_watermark(current, chunk):
+    """Fold one more chunk into a running (watermark, check_ids) pair."""
+    watermark, check_ids = current
+    chunk_mark, chunk_ids = compute_watermark(chunk)
+    if chunk_mark is None or (watermark is not None and chunk_mark < watermark):
+        return current
+    if watermark is not None and chunk_mark == watermark:
+        return watermark, check_ids | chunk_ids
+    return chunk_mark, chunk_ids
+
+def report_progress(rows, bytes_written, started):
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    print(f"   ⏳ {rows:,} filas | {rows / elapsed:,.0f} filas/s | {bytes_written / 1e6:,.1f} MB escritos")
+
+def save_chunks(chunks, path=SNAPSHOT_FILE, csv_path=CSV_FILE):
+    """Write chunks to the snapshot as they arrive; return the row count and the watermark."""
+    mark = (None, set())
+    started = time.perf_counter()
+
+    def track(chunks):
+        nonlocal mark
+        for chunk in chunks:
+            mark = merge_watermark(mark, chunk)
+            yield chunk
+
+    rows = write_snapshot(track(chunks), path=path, csv_path=csv_path,
+                          progress=lambda rows, written: report_progress(rows, written, started))
+    return rows, mark
+
+def upsert_rows(chunks, delta):
+    """Replace every row of the cases in `delta` with the delta's rows, chunk by chunk.
+
+    The incremental query filters on the case's last activity, so `delta` holds every current
+    row of each changed case; rows of checks removed from such a case must go as well. The
+    existing chunks come out without those cases' rows, followed by `delta`.
+    """
+    changed = delta['case_id'].astype(str).unique()
+    for chunk in chunks:
+        kept = chunk[~chunk['case_id'].astype(str).isin(changed)]
+        if not kept.empty:
+            yield kept
+    if not delta.empty:
+        yield delta
+
+def needs_full_reconcile(state, force_full=False, snapshot_path=SNAPSHOT_FILE):
+    """A full pull is required on the first run, on demand, or every FULL_RECONCILE_EVERY runs."""
+    if force_full or not os.path.exists(snapshot_path) or not state.get('watermark'):
+        return True
+    return state.get('runs_since_full', 0) >= FULL_RECONCILE_EVERY
+
+def fetch_changed_rows(engine, state):
+    """Pull only the rows of cases whose last_activity_at is at or past the stored watermark."""
+    delta = run_query(engine, BASE_QUERY + INCREMENTAL_FILTER, params={"watermark": state['watermark']})
+    # Las filas que estaban justo en la marca de agua ya se guardaron en la corrida anterior: se descartan
+    # los casos que solo traen esas filas, y los demás se conservan completos (upsert_rows los reemplaza enteros)
+    seen = set(state.get('watermark_check_ids', []))
+    if seen and not delta.empty:
+        mark = to_naive_datetime(pd.Series([state['watermark']]))[0]
+        on_mark = to_naive_datetime(delta['last_activity_cases']) == mark
+        unseen = ~(on_mark & delta['check_id'].astype(str).isin(seen))
+        delta = delta[delta['case_id'].isin(delta.loc[unseen, 'case_id'].unique())]
+    return normalize_types(delta)
+
+def version_manifest(version, parent, directory, mode, rows, started):
+    """Row counts, schema and build duration of a version, stored next to its files."""
+    snapshot = os.path.join(directory, SNAPSHOT_FILE)
+    counts = {'rows': rows}
+    for name, path in table_paths(directory).items():
+        counts[name] = pq.ParquetFile(path).metadata.num_rows
+    counts['lifecycle'] = pq.ParquetFile(os.path.join(directory, LIFECYCLE_FILE)).metadata.num_rows
+    return {
+        'version': version,
+        'parent': parent,
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'mode': mode,
+        'build_seconds': round(time.perf_counter() - started, 2),
+        'row_counts': counts,
+        'schema': {field.name: str(field.type) for field in pq.read_schema(snapshot)},
+    }
+
+def build_version(engine, state, directory, source, full, chunksize, parallelism, partition_by, trace=None):
+    """Write the snapshot, tables, partitions and case lifecycle of a new version into ``directory``.
+
+    ``source`` is the directory of the version it starts from (incremental pulls and unchanged
+    partitions come from there). Returns the mode, row count and watermark.
+    """
+    snapshot_path = os.path.join(directory, SNAPSHOT_FILE)
+    csv_path = os.path.join(directory, CSV_FILE)
+    if needs_full_reconcile(state, force_full=full, snapshot_path=os.path.join(source, SNAPSHOT_FILE)):
+        # Guardar lote a lote, sin materializar el resultado completo
+        if parallelism > 1:
+            if partition_by == "hash":
+                partitions = hash_partitions(parallelism * HASH_PARTITIONS_PER_WORKER)
+            else:
+                partitions = month_partitions(engine)
+            print(f"🧩 Extracción en paralelo: {len(partitions)} particiones, {parallelism} hilos")
+            chunks = fetch_partitioned(engine, partitions, parallelism, chunksize=chunksize)
+        else:
+            chunks = stream_query(engine, BASE_QUERY, chunksize=chunksize)
+        rows, mark = save_chunks(chunks, path=snapshot_path, csv_path=csv_path)
+        mode = 'full'
+        state['runs_since_full'] = 0
+        state['last_full_at'] = datetime.now(timezone.utc).isoformat()
+        print(f"🔄 Reconciliación completa: {rows} filas")
+        changed_cases = None
+    else:
+        delta = fetch_changed_rows(engine, state)
+        changed_cases = delta['case_id'].unique()
+        # El snapshot anterior se recorre por lotes: la memoria no crece con el histórico
+        chunks = upsert_rows(read_snapshot_chunks(os.path.join(source, SNAPSHOT_FILE)), delta)
+        rows, mark = save_chunks(chunks, path=snapshot_path, csv_path=csv_path)
+        mode = 'incremental'
+        state['runs_since_full'] = state.get('runs_since_full', 0) + 1
+        print(f"🔄 Actualización incremental: {len(delta)} filas nuevas o modificadas")
+    lap(trace, f"extract.{mode}")
+
+    derive_files(directory, source, trace, changed_cases)
+    return mode, rows, mark
+
+def derive_files(directory, source=None, trace=None, changed_cases=None):
+    """Write the tables, month partitions, case lifecycle and Dashboard rollup derived from the snapshot
+    in ``directory``.
+
+    Partitions unchanged since the version in ``source`` are linked from there (None: in place).
+    With ``changed_cases`` (an incremental pull), only those cases' lifecycle rows are recomputed
+    from the version in ``source``.
+    """
+    snapshot_path = os.path.join(directory, SNAPSHOT_FILE)
+    # Tablas normalizadas (casos / checks / individuos) derivadas del snapshot
+    write_tables(snapshot_path, directory=directory)
+    lap(trace, "derive.tables")
+    # Particiones mensuales: solo se escriben las que cambiaron; el resto se enlaza de la versión anterior
+    rewritten = write_partitions(snapshot_path, directory=os.path.join(directory, PARTITION_DIR),
+                                 previous_directory=os.path.join(source, PARTITION_DIR) if source else None)
+    print(f"🗂️ Particiones reescritas: {len(rewritten)} ({', '.join(rewritten) or 'ninguna'})")
+    lap(trace, "derive.partitions")
+    # Una fila por caso con su ciclo de vida (resolución, antigüedad) para Advanced Stats
+    cases = prepare_tables(read_tables(directory, names=['cases']))['cases']
+    write_lifecycle(cases, path=os.path.join(directory, LIFECYCLE_FILE),
+                    previous_path=os.path.join(source, LIFECYCLE_FILE) if source else None, changed=changed_cases)
+    lap(trace, "derive.lifecycle")
+    # Conteos del Dashboard por mes para las selecciones de meses completos
+    write_rollup(cases, directory)
+    lap(trace, "derive.rollup")
+
+# Obtener los datos de PostgreSQL y publicarlos como una nueva versión en snapshots/ (y Data.csv)
+def fetch_and_save_data(full=False, chunksize=CHUNK_SIZE, parallelism=PARALLELISM, partition_by=PARTITION_BY,
+                        engine=None):
+    """Publish a new version and return its ID; None when another refresh (cron or service) is running."""
+    lock = acquire_refresh_lock()
+    if lock is None:
+        print("⏭️ Otra actualización está en curso; se omite esta corrida")
+        return None
+    try:
+        return publish_new_version(full, chunksize, parallelism, partition_by, engine)
+    finally:
+        release_refresh_lock(lock)
+
+def publish_new_version(full, chunksize, parallelism, partition_by, engine):
+    started = time.perf_counter()
+    trace = start_trace()
+    if engine is None:
+        engine = connect_to_db(pool_size=parallelism) if parallelism > 1 else connect_to_db()
+    state = load_state()
+    parent = current_version()
+    # La primera versión parte de los archivos sueltos del layout anterior
+    source = version_path(parent) if parent else "."
+    version = new_version_id()
+
+    # Se construye en un directorio aparte; los lectores no lo ven hasta publicarlo
+    staging = staging_dir()
+    lap(trace, "connect")
+    try:
+        mode, rows, (watermark, check_ids) = build_version(engine, state, staging, source, full, chunksize,
+                                                          parallelism, partition_by, trace)
+        publish(staging, version_manifest(version, parent, staging, mode, rows, started))
+        lap(trace, "publish")
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    # Exportación CSV en la raíz para quien la siga consumiendo, reemplazada de una vez
+    link_or_copy(os.path.join(version_path(version), CSV_FILE), CSV_FILE + ".tmp")
+    os.replace(CSV_FILE + ".tmp", CSV_FILE)
+    lap(trace, "csv_export")
+
+    if watermark is not None:
+        # Los timestamps del snapshot están en UTC sin zona; se guarda con offset explícito para Postgres
+        state['watermark'] = utc_text(watermark)
+        state['watermark_check_ids'] = sorted(check_ids)
+    state['version'] = version
+
+    save_state(state)
+    deleted = collect_garbage()
+    lap(trace, "state_and_gc")
+    print(f"✅ Versión {version} publicada ({rows} filas, {time.perf_counter() - started:.1f} s)"
+          + (f"; versiones eliminadas: {', '.join(deleted)}" if deleted else ""))
+    print(format_trace(trace))
+    write_metrics(REFRESH_METRICS_FILE, prefix="refresh", force=True)
+    return version
 
 # Ejecutar la función
 if __name__ == "__main__":
-    fetch_and_save_data()
+    parser = argparse.ArgumentParser(description="Refresh the Data.parquet snapshot from PostgreSQL")
+    parser.add_argument("--full", action="store_true", help="Force a full reconcile instead of an incremental pull")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Rows fetched per server-side cursor batch")
+    parser.add_argument("--parallel", type=int, default=PARALLELISM,
+                        help="Concurrent partition queries for a full reconcile (1 = serial)")
+    parser.add_argument("--partition-by", choices=["month", "hash"], default=PARTITION_BY,
+                        help="Split the full extraction by created_at month or by case_id hash")
+    args = parser.parse_args()
+    fetch_and_save_data(full=args.full, chunksize=args.chunk_size, parallelism=args.parallel,
+                        partition_by=args.partition_by)